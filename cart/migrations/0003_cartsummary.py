@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartSummary = apps.get_model('cart', 'CartSummary')
+    totals = (
+        Cart.objects.values('user')
+        .annotate(
+            items=models.Sum('quantity'),
+            lines=models.Count('id'),
+            amount=models.Sum(models.ExpressionWrapper(
+                models.F('quantity') * models.F('product__price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ))
+        )
+    )
+    CartSummary.objects.bulk_create(
+        [
+            CartSummary(user_id=row['user'], item_count=row['items'], line_count=row['lines'], subtotal=row['amount'])
+            for row in totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('cart', '0002_cart_cart_user_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cart_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
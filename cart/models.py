@@ -1,8 +1,86 @@
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
 from users.models import User
 from products.models import Product
 
 
+class CartManager(models.Manager):
+    UPSERT_VENDORS = ('sqlite', 'postgresql')
+    
+    def add_item(self, user, product, quantity=1):
+        """
+        Add ``quantity`` of ``product`` to the user's cart in one statement.
+        
+        Uses ``INSERT ... ON CONFLICT (user, product) DO UPDATE SET quantity =
+        quantity + excluded.quantity RETURNING ...`` so concurrent adds of the
+        same product can neither lose an update nor trip the unique
+        constraint. Returns ``(line, created)``.
+        """
+        connection = connections[self.db]
+        if connection.vendor not in self.UPSERT_VENDORS:
+            return self._add_item_locked(user, product, quantity)
+        
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        fields = [opts.get_field(name) for name in ('user', 'product', 'quantity', 'created_at', 'updated_at')]
+        now = timezone.now()
+        values = [user.pk, product.pk, quantity, now, now]
+        params = [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)]
+        columns = {field.name: qn(field.column) for field in fields}
+        returning = f'{qn(opts.pk.column)}, {columns["quantity"]}, {columns["created_at"]}'
+        if connection.vendor == 'postgresql':
+            # xmax is 0 only on a row version this statement inserted
+            guard, returning = '', f'{returning}, xmax = 0'
+        else:
+            # Lines holding units are the only ones added to here, so the
+            # total equals the quantity sent only when the line is inserted
+            guard = f'WHERE {table}.{columns["quantity"]} > 0 '
+        sql = (
+            f'INSERT INTO {table} ({", ".join(columns.values())}) VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT ({columns["user"]}, {columns["product"]}) DO UPDATE SET '
+            f'{columns["quantity"]} = {table}.{columns["quantity"]} + excluded.{columns["quantity"]}, '
+            f'{columns["updated_at"]} = excluded.{columns["updated_at"]} '
+            f'{guard}RETURNING {returning}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            # An existing line with zero units, left to the locked update
+            return self._add_item_locked(user, product, quantity)
+        
+        pk, total, created_at, *inserted = row
+        created_at = self._from_db(opts.get_field('created_at'), created_at, connection)
+        line = self.model(
+            pk=pk, user=user, product=product, quantity=total, created_at=created_at, updated_at=now
+        )
+        return line, bool(inserted[0]) if inserted else total == quantity
+    
+    def _from_db(self, field, value, connection):
+        col = field.cached_col
+        for converter in connection.ops.get_db_converters(col) + field.get_db_converters(connection):
+            value = converter(value, col, connection)
+        return value
+    
+    def _add_item_locked(self, user, product, quantity):
+        while True:
+            try:
+                with transaction.atomic(using=self.db):
+                    line = self.select_for_update().filter(user=user, product=product).first()
+                    if line is None:
+                        return self.create(user=user, product=product, quantity=quantity), True
+                    line.quantity = F('quantity') + quantity
+                    line.save(update_fields=['quantity', 'updated_at'])
+                    line.refresh_from_db(fields=['quantity'])
+                    return line, False
+            except IntegrityError:
+                # Lost the race to insert the line; retry as an update
+                continue
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -10,8 +88,14 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartManager()
+    
     class Meta:
         unique_together = ['user', 'product']
+        indexes = [
+            # Cart listing: WHERE user_id = ? ORDER BY id
+            models.Index(fields=['user', 'id'], name='cart_user_id_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.email} - {self.product.name}'
@@ -21,4 +105,79 @@ class Cart(models.Model):
         return self.product.price * self.quantity
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class CartSummaryManager(models.Manager):
+    def apply(self, user_id, items=0, lines=0, subtotal=Decimal('0')):
+        """Adjust a user's summary by the given deltas"""
+        updated = self.filter(user_id=user_id).update(
+            item_count=F('item_count') + items,
+            line_count=F('line_count') + lines,
+            subtotal=F('subtotal') + subtotal
+        )
+        if not updated:
+            self.refresh([user_id])
+    
+    def reset(self, user_id):
+        self.update_or_create(user_id=user_id, defaults={
+            'item_count': 0, 'line_count': 0, 'subtotal': Decimal('0')
+        })
+    
+    def refresh(self, user_ids):
+        """Recompute summaries of ``user_ids`` from their cart lines"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        summaries = {
+            user_id: self.model(user_id=user_id, item_count=0, line_count=0, subtotal=Decimal('0'))
+            for user_id in user_ids
+        }
+        totals = (
+            Cart.objects.filter(user__in=user_ids)
+            .values('user')
+            .annotate(
+                items=Sum('quantity'),
+                lines=Count('id'),
+                amount=Sum(ExpressionWrapper(
+                    F('quantity') * F('product__price'),
+                    output_field=DecimalField(max_digits=12, decimal_places=2)
+                ))
+            )
+        )
+        for row in totals:
+            summary = summaries[row['user']]
+            summary.item_count = row['items']
+            summary.line_count = row['lines']
+            summary.subtotal = row['amount']
+        self.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['item_count', 'line_count', 'subtotal', 'updated_at']
+        )
+    
+    def refresh_for_product(self, product_id):
+        """Recompute summaries of every cart holding ``product_id``"""
+        self.refresh_for_products([product_id])
+    
+    def refresh_for_products(self, product_ids):
+        """Recompute summaries of every cart holding any of ``product_ids``"""
+        if product_ids:
+            self.refresh(Cart.objects.filter(product_id__in=product_ids).values_list('user_id', flat=True))
+
+
+class CartSummary(models.Model):
+    """Running cart totals per user, kept in step with cart mutations"""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='cart_summary'
+    )
+    item_count = models.PositiveIntegerField(default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CartSummaryManager()
+    
+    def __str__(self):
+        return f'{self.user_id}: {self.item_count} items, {self.subtotal}'
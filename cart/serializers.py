@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import Cart
-from products.serializers import ProductSerializer
+from core.projections import Projection, datetime_renderer, decimal_renderer
+from .models import Cart, CartSummary
+from products.serializers import ProductProjection, ProductSerializer
 
     
 class CartSerializer(serializers.ModelSerializer):
@@ -24,4 +25,56 @@ class CartSerializer(serializers.ModelSerializer):
 class CartUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
-        fields = ['quantity']
\ No newline at end of file
+        fields = ['quantity']
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=0)
+    
+    def validate(self, data):
+        if data['op'] == 'add' and data.get('quantity', 1) < 1:
+            raise serializers.ValidationError({'quantity': 'Quantity must be at least 1'})
+        if data['op'] == 'set' and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        data.setdefault('quantity', 1 if data['op'] == 'add' else 0)
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 500
+    
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+    
+    def validate_operations(self, value):
+        if len(value) > self.MAX_OPERATIONS:
+            raise serializers.ValidationError(f'At most {self.MAX_OPERATIONS} operations per request')
+        return value
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CartSummary
+        fields = ['item_count', 'line_count', 'subtotal', 'updated_at']
+
+
+class CartProjection(Projection):
+    """Read-only equivalent of ``CartSerializer``"""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.product = ProductProjection(request, prefix='product__')
+        self.source_fields = ['id', 'product', 'quantity', 'created_at'] + self.product.source_fields
+        self.render_total = decimal_renderer(10, 2)
+        self.render_datetime = datetime_renderer()
+
+    def render_row(self, row):
+        return {
+            'id': row['id'],
+            'product': row['product'],
+            'product_detail': self.product.render_row(row),
+            'quantity': row['quantity'],
+            'total_price': self.render_total(row['product__price'] * row['quantity']),
+            'created_at': self.render_datetime(row['created_at']),
+        }
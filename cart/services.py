@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.utils import timezone
+from products.models import Product
+from .models import Cart, CartSummary
+
+
+class UnknownProducts(Exception):
+    """Raised when operations reference products that don't exist"""
+
+    def __init__(self, product_ids):
+        super().__init__('Unknown products')
+        self.product_ids = product_ids
+
+
+@transaction.atomic
+def apply_cart_operations(user, operations):
+    """
+    Apply a list of ``{'op', 'product', 'quantity'}`` operations to a cart.
+
+    ``add`` increases a line, ``set`` replaces its quantity (0 removes it)
+    and ``remove`` deletes it; operations apply in order. Products and the
+    existing lines are each read with one ``IN`` query, the results are
+    written back with a single upsert on ``(user, product)`` and a single
+    delete, and the cart summary is recomputed once.
+    """
+    product_ids = {operation['product'] for operation in operations}
+    products = Product.objects.in_bulk(product_ids)
+    missing = sorted(product_ids - set(products))
+    if missing:
+        raise UnknownProducts(missing)
+
+    lines = Cart.objects.filter(user=user, product__in=product_ids)
+    if transaction.get_connection().features.has_select_for_update:
+        lines = lines.select_for_update()
+    quantities = {line.product_id: line.quantity for line in lines}
+    existing = set(quantities)
+
+    for operation in operations:
+        product_id = operation['product']
+        if operation['op'] == 'add':
+            quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+        elif operation['op'] == 'set':
+            quantities[product_id] = operation['quantity']
+        else:
+            quantities[product_id] = 0
+
+    now = timezone.now()
+    upserts = [
+        Cart(user=user, product=products[product_id], quantity=quantity, created_at=now, updated_at=now)
+        for product_id, quantity in quantities.items() if quantity > 0
+    ]
+    removed = [product_id for product_id, quantity in quantities.items() if quantity <= 0 and product_id in existing]
+
+    if upserts:
+        Cart.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'updated_at']
+        )
+    if removed:
+        Cart.objects.filter(user=user, product__in=removed).delete()
+    CartSummary.objects.refresh([user.pk])
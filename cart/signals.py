@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from products.models import Product
+from .models import Cart, CartSummary
+
+
+@receiver(pre_save, sender=Product)
+def snapshot_product_price(sender, instance, using, update_fields=None, **kwargs):
+    instance._saved_price = None
+    if instance._state.adding or 'price' in instance.get_deferred_fields():
+        return
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    instance._saved_price = sender._base_manager.using(using).filter(pk=instance.pk).values_list(
+        'price', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Product)
+def refresh_summaries_on_product_change(sender, instance, created, **kwargs):
+    # Price edits change the subtotal of every cart holding the product
+    saved_price = getattr(instance, '_saved_price', None)
+    if not created and saved_price is not None and saved_price != instance.price:
+        CartSummary.objects.refresh_for_product(instance.pk)
+
+
+@receiver(pre_delete, sender=Product)
+def collect_cart_users(sender, instance, **kwargs):
+    instance._cart_user_ids = list(
+        Cart.objects.filter(product=instance).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def refresh_summaries_on_product_delete(sender, instance, **kwargs):
+    # The cart lines were removed by the cascade
+    CartSummary.objects.refresh(getattr(instance, '_cart_user_ids', []))
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from core.testing import QueryBudgetTestMixin
+from products.models import Product
+from users.models import User
+from .models import Cart, CartSummary
+from .serializers import CartProjection, CartSerializer
+from .views import CartSummaryView
 
-# Create your tests here.
+
+class CartProjectionTests(TestCase):
+    def test_matches_serializer_output(self):
+        user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        for i, price in enumerate(['9.99', '0.10', '120.00']):
+            product = Product.objects.create(name=f'P{i}', description='', price=Decimal(price), stock=3,
+                                             image=f'products/{i}.png' if i else None)
+            Cart.objects.create(user=user, product=product, quantity=i + 1)
+        request = APIRequestFactory().get('/api/cart/')
+        queryset = Cart.objects.filter(user=user).select_related('product').order_by('id')
+        expected = CartSerializer(queryset, many=True, context={'request': request}).data
+        projection = CartProjection(request)
+        actual = projection.render(projection.project(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+class CartSummaryTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.a = Product.objects.create(name='A', description='', price=Decimal('2.50'), stock=10)
+        self.b = Product.objects.create(name='B', description='', price=Decimal('10.00'), stock=10)
+
+    def summary(self):
+        with self.assertWithinQueryBudget(CartSummaryView):
+            data = self.client.get(reverse('cart-summary')).data
+        return data['item_count'], data['line_count'], data['subtotal']
+
+    def add(self, product, quantity):
+        self.client.post(reverse('cart-list'), {'product': product.pk, 'quantity': quantity})
+
+    def test_empty_cart(self):
+        self.assertEqual(self.summary(), (0, 0, '0.00'))
+
+    def test_tracks_cart_mutations(self):
+        self.add(self.a, 2)
+        self.add(self.b, 1)
+        self.add(self.a, 1)
+        self.assertEqual(self.summary(), (4, 2, '17.50'))
+
+        line = Cart.objects.get(user=self.user, product=self.a)
+        self.client.patch(reverse('cart-detail', args=[line.pk]), {'quantity': 1})
+        self.assertEqual(self.summary(), (2, 2, '12.50'))
+
+        self.client.delete(reverse('cart-detail', args=[line.pk]))
+        self.assertEqual(self.summary(), (1, 1, '10.00'))
+
+        self.client.delete(reverse('clear-cart'))
+        self.assertEqual(self.summary(), (0, 0, '0.00'))
+
+    def test_re_adding_to_an_emptied_line_keeps_line_count(self):
+        self.add(self.a, 2)
+        line = Cart.objects.get(user=self.user, product=self.a)
+        self.client.patch(reverse('cart-detail', args=[line.pk]), {'quantity': 0})
+        self.add(self.a, 1)
+        self.assertEqual(self.summary(), (1, 1, '2.50'))
+
+    def test_price_change_and_product_delete_recompute(self):
+        self.add(self.a, 2)
+        self.add(self.b, 1)
+        self.a.price = Decimal('3.00')
+        self.a.save()
+        self.assertEqual(self.summary(), (3, 2, '16.00'))
+        self.b.delete()
+        self.assertEqual(self.summary(), (2, 1, '6.00'))
+
+    def test_only_price_changes_recompute(self):
+        self.add(self.a, 2)
+        with mock.patch.object(CartSummary.objects, 'refresh_for_product') as refresh:
+            self.a.stock = 4
+            self.a.save()
+            self.a.price = Decimal('2.50')
+            self.a.save()
+            refresh.assert_not_called()
+            self.a.price = Decimal('3.00')
+            self.a.save()
+            refresh.assert_called_once_with(self.a.pk)
+
+    def test_checkout_empties_summary(self):
+        self.add(self.a, 2)
+        self.client.post(reverse('order-create'), {})
+        self.assertEqual(self.summary(), (0, 0, '0.00'))
+        self.assertEqual(CartSummary.objects.get(user=self.user).line_count, 0)
+
+
+class CartBatchTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(name=f'P{i}', description='', price=Decimal('1.50'), stock=10)
+            for i in range(30)
+        ]
+        self.url = reverse('cart-batch')
+
+    def batch(self, operations):
+        return self.client.post(self.url, {'operations': operations}, format='json')
+
+    def test_applies_operations_in_order(self):
+        a, b, c = self.products[:3]
+        self.add_existing(a, 2)
+        self.add_existing(c, 1)
+        response = self.batch([
+            {'op': 'add', 'product': a.pk, 'quantity': 3},
+            {'op': 'add', 'product': b.pk},
+            {'op': 'set', 'product': b.pk, 'quantity': 4},
+            {'op': 'remove', 'product': c.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        quantities = dict(Cart.objects.filter(user=self.user).values_list('product', 'quantity'))
+        self.assertEqual(quantities, {a.pk: 5, b.pk: 4})
+        self.assertEqual([item['product'] for item in response.data['items']], [a.pk, b.pk])
+        self.assertEqual(response.data['summary']['item_count'], 9)
+        self.assertEqual(response.data['summary']['subtotal'], '13.50')
+
+    def add_existing(self, product, quantity):
+        self.client.post(reverse('cart-list'), {'product': product.pk, 'quantity': quantity})
+
+    def test_query_count_does_not_grow_with_operations(self):
+        counts = []
+        for operations in ([self.products[0]], self.products[1:]):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.batch([{'op': 'add', 'product': p.pk, 'quantity': 1} for p in operations])
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 30)
+
+    def test_unknown_product_rejects_whole_batch(self):
+        response = self.batch([
+            {'op': 'add', 'product': self.products[0].pk},
+            {'op': 'add', 'product': 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['products'], [999999])
+        self.assertFalse(Cart.objects.exists())
+
+
+class CartAddItemTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.product = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=10)
+
+    def test_insert_then_increment_in_one_query_each(self):
+        with self.assertNumQueries(1):
+            line, created = Cart.objects.add_item(self.user, self.product, 2)
+        self.assertTrue(created)
+        with self.assertNumQueries(1):
+            again, created = Cart.objects.add_item(self.user, self.product, 3)
+        self.assertFalse(created)
+        self.assertEqual((again.pk, again.quantity), (line.pk, 5))
+        self.assertEqual(again.created_at, Cart.objects.get(pk=line.pk).created_at)
+
+
+    def test_adds_in_the_same_microsecond_are_told_apart(self):
+        with mock.patch('cart.models.timezone.now', return_value=timezone.now()):
+            self.assertTrue(Cart.objects.add_item(self.user, self.product, 1)[1])
+            line, created = Cart.objects.add_item(self.user, self.product, 1)
+        self.assertFalse(created)
+        self.assertEqual(line.quantity, 2)
+
+    def test_adding_to_a_line_with_zero_units_is_not_an_insert(self):
+        existing = Cart.objects.create(user=self.user, product=self.product, quantity=0)
+        line, created = Cart.objects.add_item(self.user, self.product, 2)
+        self.assertFalse(created)
+        self.assertEqual((line.pk, line.quantity), (existing.pk, 2))
+
+class CartAddItemConcurrencyTests(TransactionTestCase):
+    threads = 8
+    adds_per_thread = 25
+
+    def test_parallel_adds_of_same_product_are_all_counted(self):
+        user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        product = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=10)
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(self.adds_per_thread):
+                    while True:
+                        try:
+                            Cart.objects.add_item(user, product, 1)
+                            break
+                        except OperationalError:
+                            # SQLite reports lock contention instead of waiting; retry
+                            time.sleep(0.001)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        line = Cart.objects.get(user=user, product=product)
+        self.assertEqual(line.quantity, self.threads * self.adds_per_thread)
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import CartListView, CartDetailView, ClearCartView
+from core.asyncviews import select_view
+from .views import AsyncCartListView, CartListView, CartDetailView, ClearCartView, CartSummaryView, CartBatchView
 
 urlpatterns = [
-    path('', CartListView.as_view(), name='cart-list'),
+    path('', select_view('cart-list', CartListView, AsyncCartListView), name='cart-list'),
     path('<int:pk>/', CartDetailView.as_view(), name='cart-detail'),
     path('clear/', ClearCartView.as_view(), name='clear-cart'),
-]
\ No newline at end of file
+    path('summary/', CartSummaryView.as_view(), name='cart-summary'),
+    path('batch/', CartBatchView.as_view(), name='cart-batch'),
+]
@@ -1,56 +1,133 @@
 from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
-from .models import Cart
-from .serializers import CartSerializer, CartUpdateSerializer
+from core.asyncviews import AsyncListView
+from core.idempotency import IdempotentMixin
+from core.instrumentation import SerializerTimingMixin, span
+from core.pagination import OptInKeysetPagination
+from core.projections import ProjectionListMixin
+from .models import Cart, CartSummary
+from .serializers import (
+    CartBatchSerializer, CartProjection, CartSerializer, CartSummarySerializer, CartUpdateSerializer
+)
+from .services import apply_cart_operations, UnknownProducts
 from users.permissions import IsCustomer
 
-class CartListView(generics.ListCreateAPIView):
+class CartListView(IdempotentMixin, SerializerTimingMixin, ProjectionListMixin, generics.ListCreateAPIView):
     """View and add items to cart"""
     serializer_class = CartSerializer
+    projection_class = CartProjection
+    pagination_class = OptInKeysetPagination
+    keyset_ordering = 'id'
+    # auth, count, cart lines joined with products
+    query_budget = {'GET': 3}
     
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).select_related('product').order_by('id')
     
+    @transaction.atomic
     def perform_create(self, serializer):
         product = serializer.validated_data['product']
         quantity = serializer.validated_data.get('quantity', 1)
         
-        # Check if item already exists in cart
-        cart_item = Cart.objects.filter(
-            user=self.request.user,
-            product=product
-        ).first()
+        # Insert the line or add to it in a single upsert
+        serializer.instance, created = Cart.objects.add_item(self.request.user, product, quantity)
         
-        if cart_item:
-            cart_item.quantity += quantity
-            cart_item.save()
-        else:
-            # Create new cart item
-            serializer.save(user=self.request.user)
+        CartSummary.objects.apply(
+            self.request.user.pk, items=quantity, lines=int(created), subtotal=product.price * quantity
+        )
+
+
+class AsyncCartListView(AsyncListView):
+    """Async GET for ``CartListView``"""
+    sync_view_class = CartListView
+    projection_class = CartProjection
+    query_budget = {'GET': 3}
+
+    def get_queryset(self, request):
+        return Cart.objects.filter(user=request.user).order_by('id')
 
 
-class CartDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CartDetailView(IdempotentMixin, SerializerTimingMixin, generics.RetrieveUpdateDestroyAPIView):
     """View, update or remove cart item"""
     serializer_class = CartUpdateSerializer
+    query_budget = {'GET': 2}
     
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).select_related('product')
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        serializer = CartSerializer(instance)
-        return Response(serializer.data)
+        with span('serialize'):
+            data = CartSerializer(instance).data
+        return Response(data)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous = serializer.instance.quantity
+        instance = serializer.save()
+        delta = instance.quantity - previous
+        CartSummary.objects.apply(
+            instance.user_id, items=delta, subtotal=instance.product.price * delta
+        )
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        CartSummary.objects.apply(
+            instance.user_id, items=-instance.quantity, lines=-1,
+            subtotal=-instance.product.price * instance.quantity
+        )
 
-class ClearCartView(generics.DestroyAPIView):
+class ClearCartView(IdempotentMixin, generics.DestroyAPIView):
     """Clear entire cart"""
     def get_queryset(self):
         return Cart.objects.filter(user=self.request.user)
     
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         self.get_queryset().delete()
+        CartSummary.objects.reset(request.user.pk)
         return Response(
             {'message': 'Cart cleared successfully'},
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+class CartSummaryView(SerializerTimingMixin, generics.RetrieveAPIView):
+    """Cart item count, line count and subtotal"""
+    serializer_class = CartSummarySerializer
+    query_budget = 2
+    
+    def get_object(self):
+        # Users who never touched their cart have no row yet
+        return (
+            CartSummary.objects.filter(user=self.request.user).first()
+            or CartSummary(user=self.request.user)
+        )
+
+class CartBatchView(IdempotentMixin, APIView):
+    """Apply many add/set/remove operations to the cart in one transaction"""
+    
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            apply_cart_operations(request.user, serializer.validated_data['operations'])
+        except UnknownProducts as exc:
+            return Response(
+                {'error': 'Unknown products', 'products': exc.product_ids},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        projection = CartProjection(request)
+        items = projection.render(projection.project(
+            Cart.objects.filter(user=request.user).order_by('id')
+        ))
+        summary = CartSummary.objects.get(user=request.user)
+        return Response({
+            'items': items,
+            'summary': CartSummarySerializer(summary).data
+        })
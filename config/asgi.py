@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Selects the async login and register views (see ASYNC_VIEWS)
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
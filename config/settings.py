@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -49,13 +50,22 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'orders',
-    # 'core',
+    'jobs',
+    'core',
 ]
 
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
+AUTHENTICATION_BACKENDS = ['users.backends.PooledModelBackend']
+
+# Threads hashing passwords, and hashing jobs allowed to wait for one before
+# password operations are refused with 503
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE = 32
+
 MIDDLEWARE = [
+    'core.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,10 +73,19 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReadDatabaseMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
+# Routes served by their async views (core.asyncviews) when running under
+# ASGI (config.asgi sets DJANGO_ASGI). Read when the URLconf loads. Login and
+# registration are always async there, so password hashing never holds the
+# thread every sync view shares; read routes may be added. Under WSGI, keep
+# this empty: async views there would run through a per-request event loop.
+ASYNC_VIEWS = ['login', 'register'] if os.environ.get('DJANGO_ASGI') else []
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -86,13 +105,89 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
+# core.db.sqlite3 applies OPTIONS['pragmas'] to each connection and starts
+# atomic() blocks with BEGIN IMMEDIATE. WAL lets readers run alongside the
+# writer; BEGIN IMMEDIATE makes writers queue for the lock (up to
+# busy_timeout) instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 134217728,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # The same file opened read-only, for views with read_database = True
+    'read': {
+        'ENGINE': 'core.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {**SQLITE_PRAGMAS, 'query_only': 'ON'},
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# A file copy of default to try replica routing locally, refreshed with
+# `manage.py sync_replica`: SQLITE_REPLICA=db-replica.sqlite3
+if os.environ.get('SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['read'],
+        'NAME': BASE_DIR / os.environ['SQLITE_REPLICA'],
+    }
+
+DATABASE_ROUTERS = ['core.db.routers.ReadDatabaseRouter']
+# Aliases that safe requests to read_database views read from, one per request
+READ_DATABASES = ['replica'] if 'replica' in DATABASES else ['read']
+# Seconds a user who wrote keeps reading from default, to see their writes
+READ_YOUR_WRITES_SECONDS = 5
+
+# Cache
+# Local memory is per process; point this at FileBasedCache when running
+# several workers so catalog invalidations are seen by all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mini-ecommerce',
     }
 }
 
+# Seconds a rendered catalog page or product detail stays cached
+CATALOG_CACHE_TIMEOUT = 300
+
+# Per-view query budgets (see core.middleware.QueryBudgetMiddleware)
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_RAISE = False
+
+# Request instrumentation (see core.instrumentation)
+PERFORMANCE_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+PERFORMANCE_SERVER_TIMING = True
+PERFORMANCE_WINDOW = 1000
+
+# Job queue (see jobs.queue; run workers with `manage.py run_jobs`)
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_SECONDS = 5
+JOB_BACKOFF_MAX_SECONDS = 3600
+JOB_LEASE_SECONDS = 300
+
+# Idempotency-Key replays (see core.idempotency)
+IDEMPOTENCY_KEY_TTL = 86400
+IDEMPOTENCY_LOCK_SECONDS = 60
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,19 +213,30 @@ USE_TZ = True
 # Static files
 STATIC_URL = 'static/'
 
+# Product image derivatives (products.images); 0 workers generates them inline
+PRODUCT_IMAGE_WIDTHS = [160, 320, 640, 1280]
+PRODUCT_IMAGE_FORMATS = ['webp', 'jpeg']
+PRODUCT_IMAGE_QUALITY = 80
+PRODUCT_IMAGE_WORKERS = 2
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Token buckets: burst size / full refill time
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '60/min',
+        'login_email': '10/min',
+    },
 }
 
 # JWT Settings
@@ -142,4 +248,10 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
-}
\ No newline at end of file
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+}
+
+# Seconds a user's role/is_active stay cached per process for claims-based
+# authentication; also how long a role change or deactivation can take to
+# revoke tokens served by other processes
+AUTH_USER_CACHE_TTL = 30
\ No newline at end of file
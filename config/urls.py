@@ -10,4 +10,5 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/cart/', include('cart.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/metrics/', include('core.urls')),
 ]
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Async (ASGI-native) versions of read-heavy endpoints.
+
+DRF views are synchronous, so under ASGI every request to them hops to a
+worker thread. ``AsyncReadView`` serves ``GET`` from a coroutine instead:
+authentication, permissions, throttling, pagination and rendering follow
+the DRF view it stands in for (``sync_view_class``), and the database is
+reached through Django's async ORM. Anything it doesn't handle, like writes
+or keyset pages, is passed to the sync view unchanged, so clients can't
+tell which one served them. Views that await slow work of their own, like
+login hashing, list other methods in ``async_methods``.
+
+Routes opt in through the ``ASYNC_VIEWS`` setting, read when the URLconf
+is loaded; see ``select_view``.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound, PermissionDenied, Throttled,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .pagination import AsyncPageNumberPagination
+
+
+def select_view(route_name, sync_view_class, async_view_class):
+    """The view for ``route_name``: async when it is listed in ``ASYNC_VIEWS``"""
+    if route_name in getattr(settings, 'ASYNC_VIEWS', ()):
+        return async_view_class.as_view()
+    return sync_view_class.as_view()
+
+
+class JSONResponse(HttpResponse):
+    """Response rendered like DRF's ``JSONRenderer`` would render it"""
+
+    def __init__(self, data, status=status.HTTP_200_OK):
+        content = b'' if data is None else JSONRenderer().render(data)
+        super().__init__(content, status=status, content_type='application/json')
+
+
+class AsyncReadView(View):
+    sync_view_class = None
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = ()
+    async_methods = ('GET', 'HEAD')
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        cls.sync_view = staticmethod(sync_to_async(cls.sync_view_class.as_view()))
+        return view
+
+    def delegate(self, request):
+        """Whether the sync view should serve this request"""
+        return False
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.async_methods or self.delegate(request):
+            return await self.sync_view(request, *args, **kwargs)
+
+        self.request = request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+        self.authenticator = None
+        try:
+            await self.authenticate(request)
+            self.check_permissions(request)
+            self.check_throttles(request)
+            return await getattr(self, request.method.lower())(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        for authenticator in self.get_authenticators():
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                self.authenticator = authenticator
+                request.user, request.auth = result
+                return
+        request.user, request.auth = AnonymousUser(), None
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    def check_permissions(self, request):
+        for permission in self.get_permissions():
+            if not permission.has_permission(request, self):
+                if self.authenticator is None:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, 'message', None))
+
+    def check_throttles(self, request):
+        # Mirrors APIView.check_throttles
+        waits = []
+        for throttle in [throttle() for throttle in self.throttle_classes]:
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(max(waits))
+
+    def handle_exception(self, exc):
+        # Mirrors rest_framework.views.exception_handler
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = JSONResponse(data, status=exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            authenticators = self.get_authenticators()
+            if authenticators:
+                response.status_code = status.HTTP_401_UNAUTHORIZED
+                response['WWW-Authenticate'] = authenticators[0].authenticate_header(self.request)
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+class AsyncListView(AsyncReadView):
+    """Page-number listing through ``projection_class``; keyset pages go to the sync view"""
+    projection_class = None
+    pagination_class = AsyncPageNumberPagination
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    def delegate(self, request):
+        return request.GET.get('pagination') == 'keyset' or 'cursor' in request.GET
+
+    async def get(self, request, *args, **kwargs):
+        return JSONResponse(await self.alist(request))
+
+    async def alist(self, request):
+        projection = self.projection_class(request)
+        queryset = projection.project(self.get_queryset(request))
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        if page is None:
+            return await projection.arender(queryset)
+        return paginator.get_paginated_response(await projection.arender(page)).data
+
+
+class AsyncDetailView(AsyncReadView):
+    """Single object through ``projection_class``"""
+    projection_class = None
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        return JSONResponse(await self.aretrieve(request, kwargs['pk']))
+
+    async def aretrieve(self, request, pk):
+        projection = self.projection_class(request)
+        rows = await projection.arender(projection.project(self.get_queryset(request).filter(pk=pk)))
+        if not rows:
+            raise NotFound()
+        return rows[0]
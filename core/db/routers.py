@@ -0,0 +1,135 @@
+"""
+Routing of read-only requests to replica connections.
+
+Views declare ``read_database = True``; ``ReadDatabaseMiddleware`` then
+sends the reads of their safe-method requests to one of the
+``READ_DATABASES`` aliases, picked per request. By default that is the
+same SQLite file opened with ``query_only``: under WAL those reads never
+take or wait for the write lock. Aliases may also be real replicas, such
+as the file copy ``sync_replica`` refreshes, which lag behind.
+
+So that users see their own writes, an unsafe request that succeeds pins
+its user to ``default`` for ``READ_YOUR_WRITES_SECONDS``. Writes, and reads
+anywhere else, always stay on ``default``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_route = ContextVar('read_route', default=None)
+
+
+def usable(alias):
+    # Under the test runner a MIRROR of an in-memory database is a second
+    # connection that can't see the test's open transaction; read from the
+    # database it mirrors instead.
+    connection = connections[alias]
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    return not (connection.settings_dict['TEST'].get('MIRROR') and in_memory)
+
+
+def read_databases():
+    return list(getattr(settings, 'READ_DATABASES', []))
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def known_user(request):
+    """The request's user once authentication has resolved it, else ``None``"""
+    # Never evaluates a lazy user: that would query the database from
+    # inside the router
+    user = vars(request).get('user')
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    return user if user is not None and user.is_authenticated else None
+
+
+def pin_to_primary(user_id):
+    """Read ``user_id``'s requests from ``default`` for ``READ_YOUR_WRITES_SECONDS``"""
+    seconds = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+    if seconds:
+        cache.set(pin_key(user_id), True, seconds)
+
+
+class ReadRoute:
+    """Where one request's reads go: a replica, unless its user wrote recently"""
+
+    def __init__(self, aliases, request=None):
+        self.aliases = aliases
+        self.request = request
+        self.alias = None
+        self.user_id = None
+        self.pinned = False
+
+    def resolve(self):
+        """The alias for the next read, or ``None`` for ``default``"""
+        if self.request is not None:
+            user = known_user(self.request)
+            if user is not None and user.pk != self.user_id:
+                self.user_id = user.pk
+                self.pinned = cache.get(pin_key(user.pk)) is not None
+        if self.pinned:
+            return None
+        if self.alias is None:
+            # One replica for the whole request, so its reads are consistent
+            candidates = [alias for alias in self.aliases if usable(alias)]
+            self.alias = random.choice(candidates) if candidates else DEFAULT_DB_ALIAS
+        return None if self.alias == DEFAULT_DB_ALIAS else self.alias
+
+
+def reads_may_lag():
+    """Whether the current request reads from a copy of ``default`` that may lag behind it"""
+    route = _route.get()
+    alias = route.resolve() if route is not None else None
+    if alias is None:
+        return False
+    return connections[alias].settings_dict['NAME'] != connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+
+
+def route_reads(route):
+    """Send reads of the current request along ``route`` (``None``: back to ``default``)"""
+    _route.set(route)
+
+
+@contextmanager
+def reading_from(*aliases):
+    """Send reads in the block to one of ``aliases``"""
+    token = _route.set(ReadRoute(list(aliases)))
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def read_route_for(request):
+    """The route of a request's reads, or ``None`` for ``default``"""
+    aliases = read_databases()
+    match = getattr(request, 'resolver_match', None)
+    if not aliases or match is None or request.method not in SAFE_METHODS:
+        return None
+    view_class = getattr(match.func, 'view_class', match.func)
+    return ReadRoute(aliases, request) if getattr(view_class, 'read_database', False) else None
+
+
+class ReadDatabaseRouter:
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        return route.resolve() if route is not None else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias is the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
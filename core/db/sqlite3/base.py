@@ -0,0 +1,32 @@
+"""
+SQLite backend tuned for a concurrent web workload.
+
+Accepts two ``OPTIONS`` on top of Django's:
+
+* ``pragmas``: applied to every new connection, e.g. WAL journaling,
+  ``synchronous=NORMAL``, ``busy_timeout``, ``mmap_size``, ``cache_size``.
+* ``transaction_mode``: how ``atomic()`` begins transactions. With
+  ``'IMMEDIATE'`` a transaction takes the write lock when it starts,
+  waiting up to ``busy_timeout`` for it. With SQLite's default deferred
+  transactions, a transaction that read first and then writes fails at
+  once with "database is locked" whenever another writer got in between.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,169 @@
+"""
+``Idempotency-Key`` handling for unsafe requests.
+
+A client that retries a POST it never got an answer to sends the same
+``Idempotency-Key`` header again. The first request with a key claims it
+by inserting an ``IdempotencyKey`` row (committed at once, so duplicates
+see it), and the response its handler returns is stored in the handler's
+own transaction: the writes and the stored response commit together or
+not at all. Later requests with the key get that response back, marked
+``Idempotent-Replayed: true``, without running the handler; a duplicate
+arriving while the first is still running gets a 409 rather than waiting
+on a lock.
+
+Keys expire after ``IDEMPOTENCY_KEY_TTL`` seconds; ``purge_idempotency_keys``
+deletes them. A key whose request died without an answer is released,
+or taken over after ``IDEMPOTENCY_LOCK_SECONDS``.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class Replay(Exception):
+    """Raised from ``initial`` to answer with a stored response"""
+
+    def __init__(self, record):
+        super().__init__(record.key)
+        self.record = record
+
+
+def request_hash(request):
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.get_full_path().encode(), request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def begin(user, key, digest):
+    """
+    Claim ``key`` for a request, or fetch the finished record to replay.
+
+    The returned record has no ``response_status`` when the caller now
+    holds the key.
+    """
+    now = timezone.now()
+    fresh = {
+        'request_hash': digest,
+        'response_status': None,
+        'response_body': None,
+        'locked_at': now,
+        'expires_at': now + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)),
+    }
+    record, created = IdempotencyKey.objects.get_or_create(user=user, key=key, defaults=fresh)
+    if created:
+        return record
+    # Expired keys, and keys whose request died without an answer, start over
+    abandoned = now - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60))
+    stale = Q(expires_at__lte=now) | Q(response_status__isnull=True, locked_at__lt=abandoned)
+    if IdempotencyKey.objects.filter(stale, pk=record.pk).update(**fresh):
+        return IdempotencyKey(pk=record.pk, user=user, key=key, **fresh)
+    if record.request_hash != digest:
+        raise IdempotencyKeyReused()
+    if record.response_status is None:
+        raise IdempotencyKeyInUse()
+    return record
+
+
+def _held(record):
+    return IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at, response_status__isnull=True)
+
+
+def complete(record, response):
+    _held(record).update(response_status=response.status_code, response_body=response.data)
+
+
+def release(record):
+    """Give up a key whose request failed, so the client can retry it"""
+    _held(record).delete()
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in bounded batches; returns how many"""
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lt=timezone.now())
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+
+
+class IdempotentMixin:
+    """
+    DRF view mixin honouring ``Idempotency-Key`` on unsafe requests.
+
+    Put it before the view's base class. Only responses the handler
+    returns are stored; exceptions and server errors release the key.
+    """
+
+    idempotency_record = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(HEADER)
+        if key is None or request.method in SAFE_METHODS:
+            return
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({HEADER: 'Must be 1 to 255 characters.'})
+        record = begin(request.user, key, request_hash(request))
+        if record.response_status is not None:
+            raise Replay(record)
+        self.idempotency_record = record
+        # dispatch() looks the handler up after initial(): run it, and store
+        # its response, in one transaction
+        name = request.method.lower()
+        handler = getattr(self, name)
+
+        @wraps(handler)
+        def idempotent(*args, **kwargs):
+            with transaction.atomic():
+                response = handler(*args, **kwargs)
+                if response.status_code < 500:
+                    complete(record, response)
+                    self.idempotency_record = None
+            return response
+        setattr(self, name, idempotent)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            response = Response(exc.record.response_body, status=exc.record.response_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            if self.idempotency_record is not None:
+                release(self.idempotency_record)
+                self.idempotency_record = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.idempotency_record is not None:
+            release(self.idempotency_record)
+            self.idempotency_record = None
+        return super().finalize_response(request, response, *args, **kwargs)
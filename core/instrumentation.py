@@ -0,0 +1,269 @@
+"""
+Low-overhead per-request performance instrumentation.
+
+``PerformanceMiddleware`` measures a sample of requests: wall time, number
+and duration of database queries, time spent serializing and response
+size. Sampled responses carry a ``Server-Timing`` header and feed a rolling
+window of recent requests per view, served to admins by ``MetricsView``.
+"""
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework import status
+from rest_framework.response import Response
+from .benchmarks import percentile
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'spans')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.spans = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's ``name`` timing"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - start
+
+
+# Query hooks of the request running in this context. Each connection gets
+# one ``_dispatch`` wrapper that calls them, rather than a wrapper per
+# request: async requests share the connections of the thread-sensitive
+# executor, and would otherwise each count the others' queries too.
+_query_hooks = ContextVar('query_hooks', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    for hook in reversed(_query_hooks.get()):
+        execute = partial(hook, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_dispatch():
+    for connection in connections.all():
+        if _dispatch not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_dispatch)
+
+
+@contextmanager
+def _hooked(wrapper):
+    token = _query_hooks.set(_query_hooks.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _query_hooks.reset(token)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Run ``wrapper`` around the queries of the block, on every database alias"""
+    _install_dispatch()
+    with _hooked(wrapper):
+        yield
+
+
+@asynccontextmanager
+async def aexecute_wrapper(wrapper):
+    """
+    ``execute_wrapper`` for async code.
+
+    The async ORM runs queries on a worker thread with its own connections,
+    so the dispatcher is installed from that thread; the hook itself travels
+    there with the context.
+    """
+    await sync_to_async(_install_dispatch)()
+    with _hooked(wrapper):
+        yield
+
+
+class MetricsRegistry:
+    """Rolling window of the most recent sampled requests per view"""
+
+    def __init__(self, window=None):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, view, sample):
+        with self.lock:
+            if view not in self.samples:
+                window = self.window or getattr(settings, 'PERFORMANCE_WINDOW', 1000)
+                self.samples[view] = deque(maxlen=window)
+            self.samples[view].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        with self.lock:
+            samples = {view: list(window) for view, window in self.samples.items()}
+        return {view: self.summarize(rows) for view, rows in sorted(samples.items())}
+
+    def summarize(self, rows):
+        totals = [row['total_ms'] for row in rows]
+        histogram = {f'le_{bound}': 0 for bound in BUCKETS_MS}
+        histogram['le_inf'] = 0
+        for value in totals:
+            bound = next((b for b in BUCKETS_MS if value <= b), None)
+            histogram[f'le_{bound}' if bound is not None else 'le_inf'] += 1
+        count = len(rows)
+        return {
+            'count': count,
+            'p50_ms': round(percentile(totals, 50), 3),
+            'p95_ms': round(percentile(totals, 95), 3),
+            'p99_ms': round(percentile(totals, 99), 3),
+            'avg_db_ms': round(sum(row['db_ms'] for row in rows) / count, 3),
+            'avg_queries': round(sum(row['queries'] for row in rows) / count, 2),
+            'avg_serialize_ms': round(sum(row['serialize_ms'] for row in rows) / count, 3),
+            'avg_bytes': round(sum(row['bytes'] for row in rows) / count),
+            'histogram': histogram,
+        }
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """
+    Instrument ``PERFORMANCE_SAMPLE_RATE`` of requests (0.0 - 1.0).
+
+    Unsampled requests only pay for one ``random()`` call. Works in both
+    sync and async middleware chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 1.0)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            async with aexecute_wrapper(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, metrics, time.perf_counter() - start)
+
+    def record(self, request, response, metrics, total):
+        size = 0 if response.streaming else len(response.content)
+        serialize = metrics.spans.get('serialize', 0.0)
+        registry.record(view_name(request), {
+            'total_ms': total * 1000,
+            'db_ms': metrics.db_time * 1000,
+            'queries': metrics.queries,
+            'serialize_ms': serialize * 1000,
+            'bytes': size,
+        })
+        if getattr(settings, 'PERFORMANCE_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+                f'serialize;dur={serialize * 1000:.2f}',
+                f'total;dur={total * 1000:.2f}',
+            ])
+        return response
+
+
+class SerializerTimingMixin:
+    """
+    DRF view mixin timing serializer ``.data`` as ``serialize``.
+
+    Restates the ``retrieve``, ``create`` and ``update`` actions of DRF's
+    model mixins with ``.data`` read inside ``span('serialize')``. Views
+    serving lists through a ``Projection`` are timed by
+    ``ProjectionListMixin``.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        with span('serialize'):
+            data = serializer.data
+        return Response(data)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        with span('serialize'):
+            data = serializer.data
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # Prefetched relations may be stale after the update
+            instance._prefetched_objects_cache = {}
+        with span('serialize'):
+            data = serializer.data
+        return Response(data)
@@ -0,0 +1,202 @@
+"""
+In-process load testing of the API.
+
+Requests go through Django's full stack via ``APIClient`` on a pool of
+threads, each thread with its own client, database connection and
+logged-in customer. Results are plain dicts so runs can be saved as JSON
+and compared across commits.
+"""
+import importlib
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches
+from rest_framework.test import APIClient
+from .benchmarks import percentile
+from .instrumentation import execute_wrapper
+from .middleware import QueryCounter
+
+# Login throttles off: benchmarks log the same accounts in over and over
+UNTHROTTLED = {'login_ip': None, 'login_email': None}
+
+
+def throttle_rates(rates):
+    """Override ``DEFAULT_THROTTLE_RATES`` for the block"""
+    return override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates))
+
+
+URLCONFS = ['products.urls', 'cart.urls', 'orders.urls', 'users.urls', 'config.urls']
+
+
+@contextmanager
+def async_views(routes):
+    """Reload the URLconf with ``ASYNC_VIEWS = routes``"""
+    def reload():
+        for module in URLCONFS:
+            importlib.reload(sys.modules[module])
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=routes):
+            reload()
+            yield
+    finally:
+        reload()
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Run the block against a throwaway, file-backed copy of the schema.
+
+    A file (rather than SQLite's shared in-memory database) lets worker
+    threads contend for locks the way separate server workers would.
+    """
+    setup_test_environment()
+    # Failed requests are counted in the results; don't log each traceback
+    request_logger = logging.getLogger('django.request')
+    old_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    handle, path = tempfile.mkstemp(prefix='bench-', suffix='.sqlite3')
+    os.close(handle)
+    if connection.vendor == 'sqlite':
+        test_settings['NAME'] = path
+    # Read aliases mirroring default (see core.db.routers) follow it to the file
+    mirrors = [connections[alias] for alias in settings.DATABASES
+               if settings.DATABASES[alias].get('TEST', {}).get('MIRROR') == DEFAULT_DB_ALIAS]
+    mirror_names = [mirror.settings_dict['NAME'] for mirror in mirrors]
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        for mirror in mirrors:
+            mirror.close()
+            mirror.settings_dict['NAME'] = connection.settings_dict['NAME']
+        yield
+    finally:
+        for mirror, name in zip(mirrors, mirror_names):
+            mirror.close()
+            mirror.settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+        request_logger.setLevel(old_level)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+    assert response.status_code == 200, response.content
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+    return response.data
+
+
+class Worker:
+    """Per-thread state handed to scenario callables"""
+
+    def __init__(self, index, email, password):
+        self.index = index
+        self.email = email
+        self.password = password
+        self.client = APIClient()
+        self.counter = itertools.count()
+        self.state = {}
+
+
+def run_load(scenario, concurrency, requests, accounts, setup=None, prepare=None):
+    """
+    Issue ``requests`` calls of ``scenario(worker)`` from ``concurrency`` threads.
+
+    ``accounts`` is a list of (email, password); worker ``i`` uses
+    ``accounts[i]``. ``setup(worker)`` runs once per worker and
+    ``prepare(worker)`` before every call, both outside the measurement.
+    ``scenario`` makes the one request being measured and returns its
+    response.
+    """
+    local = threading.local()
+    indexes = itertools.count()
+    barrier = threading.Barrier(concurrency)
+
+    def start_worker(_):
+        # The barrier makes every pool thread take exactly one of these
+        index = next(indexes)
+        local.worker = Worker(index, *accounts[index])
+        try:
+            if setup is not None:
+                setup(local.worker)
+        finally:
+            barrier.wait()
+
+    def stop_worker(_):
+        connections.close_all()
+        barrier.wait()
+
+    def one_call(_):
+        worker = local.worker
+        if prepare is not None:
+            try:
+                prepare(worker)
+            except Exception:
+                # Nothing was measured; count it as a failed request
+                return None, False, 0
+        # Counts the queries of every alias reads may be routed to, without
+        # connecting (and so applying the pragmas of) aliases left unused
+        counter = QueryCounter()
+        with execute_wrapper(counter):
+            start = time.perf_counter()
+            try:
+                response = scenario(worker)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+        return elapsed, ok, counter.count
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(start_worker, range(concurrency)))
+        start = time.perf_counter()
+        samples = list(pool.map(one_call, range(requests)))
+        wall = time.perf_counter() - start
+        list(pool.map(stop_worker, range(concurrency)))
+
+    latencies = [sample[0] * 1000 for sample in samples if sample[0] is not None]
+    measured = max(len(latencies), 1)
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for sample in samples if not sample[1]),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(requests / wall, 2) if wall else 0.0,
+        'queries_per_request': round(sum(sample[2] for sample in samples) / measured, 2),
+    }
+
+
+def compare_runs(current, baseline, tolerance=0.2):
+    """Regressions of p95 latency or queries per request beyond ``tolerance``"""
+    regressions = []
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline.get('results', [])}
+    for result in current['results']:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+        for metric in ('p95_ms', 'queries_per_request'):
+            if before[metric] and result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{result["scenario"]} @{result["concurrency"]}: {metric} '
+                    f'{before[metric]} -> {result[metric]}'
+                )
+    return regressions
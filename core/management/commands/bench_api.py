@@ -0,0 +1,158 @@
+import itertools
+import json
+import random
+import subprocess
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import Cart
+from core.loadtest import UNTHROTTLED, benchmark_database, compare_runs, login, run_load, throttle_rates
+from core.seeding import DEFAULT_PASSWORD, seed
+from orders.services import checkout
+from products.models import Product
+from users.models import User
+
+
+def setup_customer(worker):
+    login(worker.client, worker.email, worker.password)
+    worker.state['user'] = User.objects.get(email=worker.email)
+    worker.state['rng'] = random.Random(worker.index)
+
+
+def fill_cart(worker):
+    rng = worker.state['rng']
+    for product in rng.sample(worker.state['products'], 2):
+        Cart.objects.add_item(worker.state['user'], product, 1)
+
+
+def place_order(worker):
+    fill_cart(worker)
+    worker.state['order'] = checkout(worker.state['user'])
+
+
+_registrations = itertools.count()
+
+
+def register(worker):
+    password = 'Bench-pass-123!'
+    return APIClient().post('/api/auth/register/', {
+        'email': f'bench-register-{next(_registrations)}@example.com',
+        'password': password,
+        'password2': password,
+    }, format='json')
+
+
+def login_request(worker):
+    return APIClient().post('/api/auth/login/', {'email': worker.email, 'password': worker.password},
+                            format='json')
+
+
+def browse(worker):
+    page = worker.state['rng'].randint(1, worker.state['pages'])
+    return worker.client.get(f'/api/products/?page={page}')
+
+
+def cart_add(worker):
+    product = worker.state['rng'].choice(worker.state['products'])
+    return worker.client.post('/api/cart/', {'product': product.pk, 'quantity': 1}, format='json')
+
+
+def create_order(worker):
+    return worker.client.post('/api/orders/create/', {'shipping_address': 'Bench'}, format='json')
+
+
+def order_list(worker):
+    return worker.client.get('/api/orders/')
+
+
+def cancel(worker):
+    return worker.client.patch(f'/api/orders/{worker.state["order"].pk}/cancel/', format='json')
+
+
+# name: (scenario, prepare)
+SCENARIOS = {
+    'register': (register, None),
+    'login': (login_request, None),
+    'browse': (browse, None),
+    'cart_add': (cart_add, None),
+    'checkout': (create_order, fill_cart),
+    'order_list': (order_list, None),
+    'cancel': (cancel, place_order),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Load-test the API in process and report latency percentiles, throughput and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and level')
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON from an earlier run')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative slowdown before a regression is reported')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        results = []
+        with benchmark_database(), throttle_rates(UNTHROTTLED):
+            counts = seed(users=max(options['concurrency']), products=options['products'],
+                          cart_lines=0, orders=5, prefix='bench')
+            Product.objects.update(stock=10 ** 9)
+            accounts = [(f'bench-{i}@example.com', DEFAULT_PASSWORD) for i in range(counts['users'])]
+            products = list(Product.objects.all())
+            pages = max(1, len(products) // 10)
+
+            def setup(worker):
+                setup_customer(worker)
+                worker.state['products'] = products
+                worker.state['pages'] = pages
+
+            self.stdout.write(f'{"scenario":<12}{"conc":>5}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                              f'{"req/s":>9}{"q/req":>7}{"errors":>8}')
+            for name in options['scenarios']:
+                scenario, prepare = SCENARIOS[name]
+                for concurrency in options['concurrency']:
+                    result = run_load(scenario, concurrency, options['requests'], accounts,
+                                      setup=setup, prepare=prepare)
+                    result['scenario'] = name
+                    results.append(result)
+                    self.stdout.write(
+                        f'{name:<12}{concurrency:>5}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                        f'{result["p99_ms"]:>9.2f}{result["throughput_rps"]:>9.1f}'
+                        f'{result["queries_per_request"]:>7.1f}{result["errors"]:>8}'
+                    )
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'commit': git_commit(),
+            'requests': options['requests'],
+            'products': options['products'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare_runs(report, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(f'Regression: {regression}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}'))
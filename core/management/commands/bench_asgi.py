@@ -0,0 +1,111 @@
+import asyncio
+import random
+import time
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from core.benchmarks import percentile
+from core.loadtest import async_views, benchmark_database
+from core.seeding import seed
+from orders.models import Order
+from products.models import Product
+from users.models import User
+from users.tokens import ClaimsRefreshToken
+
+ASYNC_ROUTES = ['product-list', 'product-detail', 'cart-list', 'order-list', 'order-detail']
+
+
+async def asgi_get(app, path, token):
+    """GET ``path`` straight through the ASGI application; returns the status"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+    }
+    received = False
+    response = {}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await app(scope, receive, send)
+    return response.get('status', 500)
+
+
+class Command(BaseCommand):
+    help = 'Compare sync and async views of the read endpoints under ASGI: latency percentiles and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=400, help='Requests per route, mode and level')
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            users = max(options['concurrency'])
+            seed(users=users, products=options['products'], cart_lines=10, orders=10, prefix='bench')
+            accounts = []
+            for user in User.objects.filter(email__startswith='bench-').order_by('id'):
+                orders = list(Order.objects.filter(user=user).values_list('id', flat=True))
+                accounts.append((str(ClaimsRefreshToken.for_user(user).access_token), orders))
+            product_ids = list(Product.objects.values_list('id', flat=True))
+            pages = max(1, len(product_ids) // 10)
+
+            paths = {
+                'product-list': lambda rng, orders: f'/api/products/?page={rng.randint(1, pages)}',
+                'product-detail': lambda rng, orders: f'/api/products/{rng.choice(product_ids)}/',
+                'cart-list': lambda rng, orders: '/api/cart/',
+                'order-list': lambda rng, orders: '/api/orders/',
+                'order-detail': lambda rng, orders: f'/api/orders/{rng.choice(orders)}/',
+            }
+
+            self.stdout.write(f'{"route":<16}{"mode":<7}{"conc":>5}{"p50 ms":>9}{"p95 ms":>9}'
+                              f'{"p99 ms":>9}{"req/s":>9}{"errors":>8}')
+            for mode, routes in [('sync', []), ('async', ASYNC_ROUTES)]:
+                with async_views(routes):
+                    app = get_asgi_application()
+                    for route, make_path in paths.items():
+                        for concurrency in options['concurrency']:
+                            result = asyncio.run(self.load(
+                                app, make_path, accounts, concurrency, options['requests']))
+                            self.stdout.write(
+                                f'{route:<16}{mode:<7}{concurrency:>5}{result["p50_ms"]:>9.2f}'
+                                f'{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                                f'{result["throughput_rps"]:>9.1f}{result["errors"]:>8}'
+                            )
+
+    async def load(self, app, make_path, accounts, concurrency, requests):
+        latencies = []
+        errors = 0
+
+        async def client(index, count):
+            nonlocal errors
+            rng = random.Random(index)
+            token, orders = accounts[index % len(accounts)]
+            for _ in range(count):
+                path = make_path(rng, orders)
+                start = time.perf_counter()
+                status = await asgi_get(app, path, token)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += status >= 400
+
+        share, extra = divmod(requests, concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(*[client(i, share + (i < extra)) for i in range(concurrency)])
+        wall = time.perf_counter() - start
+        return {
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'throughput_rps': requests / wall if wall else 0.0,
+            'errors': errors,
+        }
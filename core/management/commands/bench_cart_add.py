@@ -0,0 +1,47 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from cart.models import Cart
+from core.benchmarks import count_queries, rolled_back
+from products.models import Product
+from users.models import User
+
+
+def legacy_add(user, product, quantity):
+    # The read-modify-write path CartListView.perform_create used to take
+    cart_item = Cart.objects.filter(user=user, product=product).first()
+    if cart_item:
+        cart_item.quantity += quantity
+        cart_item.save()
+    else:
+        Cart.objects.create(user=user, product=product, quantity=quantity)
+
+
+def upsert_add(user, product, quantity):
+    Cart.objects.add_item(user, product, quantity)
+
+
+class Command(BaseCommand):
+    help = 'Compare round trips and latency of legacy cart adds with the single-statement upsert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            products = Product.objects.bulk_create([
+                Product(name=f'Bench {i}', description='', price=Decimal('1.00'), stock=100)
+                for i in range(options['products'])
+            ])
+            self.stdout.write(f'{"path":<8}{"queries/add":>14}{"us/add":>10}')
+            for name, add in [('legacy', legacy_add), ('upsert', upsert_add)]:
+                user = User.objects.create_user(email=f'bench-{name}@example.com')
+                adds = len(products) * options['rounds']
+                queries = 0
+                start = time.perf_counter()
+                for _ in range(options['rounds']):
+                    for product in products:
+                        queries += count_queries(lambda: add(user, product, 1))
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{name:<8}{queries / adds:>14.2f}{elapsed / adds * 1e6:>10.1f}')
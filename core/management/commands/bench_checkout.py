@@ -0,0 +1,159 @@
+import random
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connections
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+from cart.models import Cart, CartSummary
+from core.loadtest import benchmark_database, login, run_load
+from core.seeding import DEFAULT_PASSWORD, seed
+from products.models import Product
+
+# SQLite's own defaults, set explicitly so the file leaves WAL mode
+BASELINE = {
+    'OPTIONS': {'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}},
+    'CONN_MAX_AGE': 0,
+    'READ_DATABASES': [],
+}
+
+
+def tuned():
+    return {
+        'OPTIONS': settings.DATABASES['default']['OPTIONS'],
+        'CONN_MAX_AGE': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'READ_DATABASES': settings.READ_DATABASES,
+    }
+
+
+@contextmanager
+def database_profile(profile):
+    """Reconnect with ``profile``'s options, connection age and read routing"""
+    default = connections['default'].settings_dict
+    reads = [connections[alias].settings_dict for alias in settings.READ_DATABASES]
+    saved = (default['OPTIONS'], default['CONN_MAX_AGE'], [(read['NAME'], read['OPTIONS']) for read in reads])
+    connections.close_all()
+    default['OPTIONS'] = profile['OPTIONS']
+    default['CONN_MAX_AGE'] = profile['CONN_MAX_AGE']
+    # The read aliases follow the benchmark's copy of the database, with the
+    # profile's pragmas: a WAL read connection would switch the file to WAL
+    for read in reads:
+        read['NAME'] = default['NAME']
+        read['OPTIONS'] = {
+            **read['OPTIONS'], 'pragmas': {**profile['OPTIONS'].get('pragmas', {}), 'query_only': 'ON'},
+        }
+    try:
+        with override_settings(READ_DATABASES=profile['READ_DATABASES']):
+            connections['default'].ensure_connection()
+            yield
+    finally:
+        connections.close_all()
+        default['OPTIONS'], default['CONN_MAX_AGE'], names = saved
+        for read, (name, options) in zip(reads, names):
+            read['NAME'], read['OPTIONS'] = name, options
+
+
+class Readers:
+    """Background threads browsing the catalog and order history until stopped"""
+
+    def __init__(self, threads, tokens, pages):
+        self.threads = threads
+        self.tokens = tokens
+        self.pages = pages
+        self.stop = threading.Event()
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def browse(self, index):
+        rng = random.Random(index)
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[index % len(self.tokens)]}')
+        try:
+            while not self.stop.is_set():
+                path = rng.choice([f'/api/products/?page={rng.randint(1, self.pages)}', '/api/orders/'])
+                status = client.get(path).status_code
+                close_old_connections()
+                with self.lock:
+                    self.requests += 1
+                    self.errors += status >= 400
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.workers = [threading.Thread(target=self.browse, args=(i,)) for i in range(self.threads)]
+        for thread in self.workers:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for thread in self.workers:
+            thread.join()
+
+
+class Command(BaseCommand):
+    help = 'Concurrent checkouts (with catalog readers) on default SQLite settings vs the tuned profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16])
+        parser.add_argument('--readers', type=int, default=4, help='Background browsing threads')
+        parser.add_argument('--requests', type=int, default=400, help='Checkouts per profile and level')
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            users = max(options['concurrency']) + options['readers']
+            counts = seed(users=users, products=options['products'], cart_lines=0, orders=5, prefix='bench')
+            Product.objects.update(stock=10 ** 8)
+            accounts = [(f'bench-{i}@example.com', DEFAULT_PASSWORD) for i in range(counts['users'])]
+            product_ids = list(Product.objects.values_list('id', flat=True))
+            pages = max(1, counts['products'] // 10)
+            tokens = [login(APIClient(), email, password)['access'] for email, password in accounts]
+            lock_errors = []
+
+            def setup(worker):
+                worker.client = APIClient(raise_request_exception=False)
+                worker.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens[worker.index]}')
+                worker.state['rng'] = random.Random(worker.index)
+
+            def prepare(worker):
+                # What request_finished does between requests on a real server
+                close_old_connections()
+
+            def checkout(worker):
+                product = worker.state['rng'].choice(product_ids)
+                try:
+                    response = worker.client.post('/api/cart/', {'product': product, 'quantity': 1}, format='json')
+                    if response.status_code < 400:
+                        response = worker.client.post('/api/orders/create/', {'shipping_address': 'Bench'},
+                                                      format='json')
+                except OperationalError:
+                    lock_errors.append(1)
+                    raise
+                if response.status_code >= 500:
+                    lock_errors.append(1)
+                return response
+
+            self.stdout.write(f'{"profile":<10}{"conc":>5}{"orders/s":>10}{"p50 ms":>9}{"p95 ms":>9}'
+                              f'{"errors":>8}{"locked":>8}{"reads/s":>9}{"read err":>9}')
+            for name, profile in [('baseline', BASELINE), ('tuned', tuned())]:
+                with database_profile(profile):
+                    for concurrency in options['concurrency']:
+                        Cart.objects.all().delete()
+                        CartSummary.objects.all().delete()
+                        lock_errors.clear()
+                        readers = Readers(options['readers'], tokens[-options['readers']:] or tokens, pages)
+                        with readers:
+                            result = run_load(checkout, concurrency, options['requests'], accounts,
+                                              setup=setup, prepare=prepare)
+                        wall = options['requests'] / result['throughput_rps'] if result['throughput_rps'] else 0
+                        orders = (options['requests'] - result['errors']) / wall if wall else 0
+                        self.stdout.write(
+                            f'{name:<10}{concurrency:>5}{orders:>10.1f}'
+                            f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["errors"]:>8}'
+                            f'{len(lock_errors):>8}{readers.requests / wall if wall else 0:>9.1f}'
+                            f'{readers.errors:>9}'
+                        )
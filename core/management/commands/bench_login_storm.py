@@ -0,0 +1,108 @@
+import random
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+from core.loadtest import UNTHROTTLED, benchmark_database, login, run_load, throttle_rates
+from core.seeding import DEFAULT_PASSWORD, seed
+from users import hashing
+
+
+def browse(worker):
+    page = worker.state['rng'].randint(1, worker.state['pages'])
+    return worker.client.get(f'/api/products/?page={page}')
+
+
+class Storm:
+    """Background threads hammering the login endpoint until stopped"""
+
+    def __init__(self, threads, accounts):
+        self.threads = threads
+        self.accounts = accounts
+        self.stop = threading.Event()
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def attack(self, index):
+        rng = random.Random(index)
+        client = APIClient()
+        try:
+            while not self.stop.is_set():
+                email, password = rng.choice(self.accounts)
+                if rng.random() < 0.5:
+                    password = 'wrong-password'
+                response = client.post('/api/auth/login/', {'email': email, 'password': password},
+                                       format='json')
+                with self.lock:
+                    self.statuses[response.status_code] += 1
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.workers = [threading.Thread(target=self.attack, args=(i,)) for i in range(self.threads)]
+        for thread in self.workers:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for thread in self.workers:
+            thread.join()
+
+
+class Command(BaseCommand):
+    help = 'Compare catalog latency alone and during a login storm, with and without login protections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Catalog clients')
+        parser.add_argument('--storm', type=int, default=16, help='Login storm threads')
+        parser.add_argument('--requests', type=int, default=400, help='Catalog requests per phase')
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            counts = seed(users=max(options['concurrency'], 50), products=options['products'],
+                          cart_lines=0, orders=0, prefix='bench')
+            accounts = [(f'bench-{i}@example.com', DEFAULT_PASSWORD) for i in range(counts['users'])]
+            pages = max(1, counts['products'] // 10)
+            # Catalog clients log in up front, so the storm's throttling can't lock them out
+            tokens = [login(APIClient(), email, password)['access']
+                      for email, password in accounts[:options['concurrency']]]
+
+            def setup(worker):
+                worker.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens[worker.index]}')
+                worker.state['rng'] = random.Random(worker.index)
+                worker.state['pages'] = pages
+
+            storm = options['storm']
+            # name: (storm threads, hashing pool workers, throttle rates)
+            phases = [
+                ('no storm', 0, None, None),
+                ('unprotected', storm, storm, UNTHROTTLED),
+                ('hashing pool', storm, None, UNTHROTTLED),
+                ('pool + throttle', storm, None, settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']),
+            ]
+            self.stdout.write(f'{"phase":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}'
+                              f'{"logins":>8}{"hashed":>8}{"429":>6}{"503":>6}')
+            for name, threads, workers, rates in phases:
+                cache.clear()
+                pool = hashing.HashingPool(workers=workers, queue=storm if workers else None)
+                with ExitStack() as stack:
+                    stack.enter_context(mock.patch.object(hashing, 'pool', pool))
+                    if rates is not None:
+                        stack.enter_context(throttle_rates(rates))
+                    attack = stack.enter_context(Storm(threads, accounts))
+                    result = run_load(browse, options['concurrency'], options['requests'], accounts,
+                                      setup=setup)
+                statuses = attack.statuses
+                self.stdout.write(
+                    f'{name:<16}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                    f'{result["throughput_rps"]:>9.1f}{sum(statuses.values()):>8}'
+                    f'{statuses[200] + statuses[401]:>8}{statuses[429]:>6}{statuses[503]:>6}'
+                )
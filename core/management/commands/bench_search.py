@@ -0,0 +1,80 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.benchmarks import percentile
+from core.loadtest import benchmark_database
+from products.models import Product
+from products.search import search
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'bra', 'chu', 'del', 'fin', 'gor',
+             'han', 'jes', 'kor', 'lum', 'mar', 'nox', 'pel', 'qua', 'ros', 'sul', 'tam', 'ven', 'wil']
+
+
+def icontains(queryset, query):
+    """The LIKE '%word%' search full-text search replaces"""
+    condition = Q()
+    for word in query.split():
+        condition &= Q(name__icontains=word) | Q(description__icontains=word)
+    return queryset.filter(condition).order_by('id')
+
+
+class Command(BaseCommand):
+    help = 'Compare FTS product search with icontains as the catalog grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+        parser.add_argument('--queries', type=int, default=50, help='Searches per method and size')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        vocabulary = sorted({''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+                             for _ in range(5000)})
+        methods = [('icontains', icontains), ('fts', search)]
+        with benchmark_database():
+            self.stdout.write(f'{"products":>10}{"method":>11}{"query":>8}{"p50 ms":>9}{"p95 ms":>9}{"hits":>8}')
+            rows = 0
+            for size in options['sizes']:
+                rows = self.grow(rng, vocabulary, rows, size, options['batch_size'])
+                queries = {
+                    'word': [rng.choice(vocabulary) for _ in range(options['queries'])],
+                    'prefix': [rng.choice(vocabulary)[:4] for _ in range(options['queries'])],
+                    'two': [f'{rng.choice(vocabulary)} {rng.choice(vocabulary)[:4]}'
+                            for _ in range(options['queries'])],
+                }
+                for kind, terms in queries.items():
+                    for name, method in methods:
+                        timings, hits = self.run(method, terms)
+                        self.stdout.write(
+                            f'{rows:>10}{name:>11}{kind:>8}{percentile(timings, 50):>9.2f}'
+                            f'{percentile(timings, 95):>9.2f}{hits / len(terms):>8.0f}'
+                        )
+
+    def grow(self, rng, vocabulary, rows, size, batch_size):
+        while rows < size:
+            count = min(batch_size, size - rows)
+            Product.objects.bulk_create([
+                Product(
+                    name=' '.join(rng.choices(vocabulary, k=3)).title(),
+                    description=' '.join(rng.choices(vocabulary, k=12)),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    stock=rng.randint(0, 20),
+                )
+                for _ in range(count)
+            ])
+            rows += count
+        return rows
+
+    def run(self, method, terms):
+        # What the product list does for ?search=...&in_stock=true: count, then the first page
+        timings = []
+        hits = 0
+        for term in terms:
+            start = time.perf_counter()
+            queryset = method(Product.objects.filter(stock__gt=0), term)
+            hits += queryset.count()
+            list(queryset.values('id', 'name', 'price')[:10])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, hits
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from cart.models import Cart
+from cart.serializers import CartProjection, CartSerializer
+from core.benchmarks import best_of, rolled_back
+from orders.models import Order, OrderItem
+from orders.serializers import OrderProjection, OrderSerializer
+from products.models import Product
+from products.serializers import ProductProjection, ProductSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer and values() projection rendering speed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options['sizes'], options['repeat'])
+
+    def seed(self, rows):
+        user = User.objects.create_user(email=f'bench-{rows}@example.com')
+        products = Product.objects.bulk_create([
+            Product(name=f'Bench {i}', description='x' * 200, price=Decimal('19.99'), stock=100,
+                    image=f'products/bench-{i}.jpg')
+            for i in range(rows)
+        ])
+        Cart.objects.bulk_create([Cart(user=user, product=product, quantity=2) for product in products])
+        orders = Order.objects.bulk_create([
+            Order(user=user, order_number=f'BENCH{rows}-{i}', total_amount=Decimal('59.97'))
+            for i in range(rows)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[(i + j) % rows], quantity=1,
+                      price=Decimal('19.99'), subtotal=Decimal('19.99'))
+            for i, order in enumerate(orders) for j in range(3)
+        ])
+        return user, [product.pk for product in products]
+
+    def run(self, sizes, repeat):
+        request = APIRequestFactory().get('/api/', HTTP_HOST='localhost')
+        renderer = JSONRenderer()
+        self.stdout.write(f'{"endpoint":<10}{"rows":>6}{"serializer ms":>16}{"projection ms":>16}{"speedup":>10}')
+        for rows in sizes:
+            user, product_ids = self.seed(rows)
+            cases = [
+                ('products', Product.objects.filter(pk__in=product_ids).order_by('id'),
+                 ProductSerializer, ProductProjection),
+                ('cart', Cart.objects.filter(user=user).select_related('product').order_by('id'),
+                 CartSerializer, CartProjection),
+                ('orders', Order.objects.filter(user=user).prefetch_related('items__product').order_by('-created_at', '-id'),
+                 OrderSerializer, OrderProjection),
+            ]
+            for name, queryset, serializer_class, projection_class in cases:
+                def serialize():
+                    data = serializer_class(queryset.all(), many=True, context={'request': request}).data
+                    return renderer.render(data)
+
+                def project():
+                    projection = projection_class(request)
+                    return renderer.render(projection.render(projection.project(queryset.all())))
+
+                if serialize() != project():
+                    self.stderr.write(f'{name}: projection output differs from serializer')
+                slow = best_of(serialize, repeat)
+                fast = best_of(project, repeat)
+                self.stdout.write(f'{name:<10}{rows:>6}{slow:>16.2f}{fast:>16.2f}{slow / fast:>9.1f}x')
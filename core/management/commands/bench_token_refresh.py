@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as LegacyRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.benchmarks import count_queries, percentile, rolled_back
+from users.serializers import TokenRefreshSerializer
+from users.tokens import ClaimsRefreshToken, blacklisted_jtis
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Measure refresh-token rotation latency as the outstanding/blacklisted token tables grow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[0, 10000, 100000],
+                            help='Outstanding token rows to grow the table to (e.g. 1000000)')
+        parser.add_argument('--refreshes', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = User.objects.create_user(email='bench-refresh@example.com')
+            paths = [
+                ('legacy', RefreshToken, LegacyRefreshSerializer),
+                ('claims', ClaimsRefreshToken, TokenRefreshSerializer),
+            ]
+            self.stdout.write(f'{"rows":>10}{"path":>8}{"queries":>9}{"p50 ms":>9}{"p95 ms":>9}')
+            rows = 0
+            for size in options['sizes']:
+                rows = self.grow(user, rows, size, options['batch_size'])
+                for name, token_class, serializer_class in paths:
+                    blacklisted_jtis.clear()
+                    queries, timings = self.rotate(user, token_class, serializer_class, options['refreshes'])
+                    self.stdout.write(
+                        f'{rows:>10}{name:>8}{queries:>9}'
+                        f'{percentile(timings, 50):>9.3f}{percentile(timings, 95):>9.3f}'
+                    )
+
+    def grow(self, user, rows, size, batch_size):
+        # Half of the filler tokens are blacklisted, as rotation leaves them
+        expires_at = timezone.now() + timedelta(days=7)
+        while rows < size:
+            count = min(batch_size, size - rows)
+            tokens = OutstandingToken.objects.bulk_create([
+                OutstandingToken(user=user, jti=f'bench-{rows + i}', token='', expires_at=expires_at)
+                for i in range(count)
+            ])
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[::2]])
+            rows += count
+        return rows
+
+    def rotate(self, user, token_class, serializer_class, refreshes):
+        refresh = str(token_class.for_user(user))
+
+        def rotate_once():
+            nonlocal refresh
+            serializer = serializer_class(data={'refresh': refresh})
+            serializer.is_valid(raise_exception=True)
+            refresh = serializer.validated_data['refresh']
+
+        queries = count_queries(rotate_once)
+        timings = []
+        for _ in range(refreshes):
+            start = time.perf_counter()
+            rotate_once()
+            timings.append((time.perf_counter() - start) * 1000)
+        return queries, timings
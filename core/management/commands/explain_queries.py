@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from cart.models import Cart, CartSummary
+from core.benchmarks import rolled_back
+from core.seeding import seed
+from orders.models import Order, OrderItem
+from products.models import Product
+
+
+def representative_queries(user_id, product_id, order_ids):
+    """(name, queryset, scan allowed) for every hot query the API issues"""
+    since = timezone.now() - timedelta(days=30)
+    return [
+        ('catalog page', Product.objects.order_by('id')[:10], True),
+        ('catalog keyset page', Product.objects.filter(id__gt=product_id).order_by('id')[:10], False),
+        ('product detail', Product.objects.filter(pk=product_id), False),
+        ('cart list', Cart.objects.filter(user_id=user_id).select_related('product').order_by('id')[:10], False),
+        ('cart line lookup', Cart.objects.filter(user_id=user_id, product_id=product_id), False),
+        ('carts holding product', Cart.objects.filter(product_id=product_id).values_list('user_id'), False),
+        ('cart summary', CartSummary.objects.filter(user_id=user_id), False),
+        ('order history', Order.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:10], False),
+        ('order history keyset', Order.objects.filter(user_id=user_id, created_at__lt=timezone.now())
+            .order_by('-created_at', '-id')[:10], False),
+        ('order items for page', OrderItem.objects.filter(order__in=order_ids)
+            .select_related('product').order_by('order', 'id'), False),
+        ('pending order for cancel', Order.objects.filter(user_id=user_id, status='pending', pk=order_ids[0]), False),
+        ('pending orders of user', Order.objects.filter(user_id=user_id, status='pending'), False),
+        ('admin orders by status', Order.objects.filter(status='pending').order_by('-created_at')[:100], False),
+        ('admin orders by date', Order.objects.filter(created_at__gte=since).order_by('-created_at')[:100], False),
+        ('admin products by date', Product.objects.filter(created_at__gte=since).order_by('-created_at')[:100], False),
+        ('expired token purge', OutstandingToken.objects.filter(expires_at__lt=timezone.now())
+            .order_by('expires_at').values_list('pk')[:1000], False),
+    ]
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table without any index"""
+    if connection.vendor == 'sqlite':
+        return [
+            line for line in plan.splitlines()
+            if 'SCAN' in line and 'USING' not in line and 'CONSTANT ROW' not in line
+        ]
+    return [line for line in plan.splitlines() if 'Seq Scan' in line or 'ALL' in line.split()]
+
+
+class Command(BaseCommand):
+    help = "Print query plans for the API's representative queries and flag full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='Explain against synthetic data that is rolled back afterwards')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=10, help='Orders per user')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any hot query does a full scan')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            with rolled_back():
+                counts = seed(users=options['users'], products=options['products'],
+                              orders=options['orders'], prefix='explain')
+                self.stdout.write('Seeded ' + ', '.join(f'{n} {k}' for k, n in counts.items()))
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                scans = self.explain_all()
+        else:
+            scans = self.explain_all()
+
+        if scans:
+            self.stdout.write(self.style.WARNING('Full scans in: ' + ', '.join(scans)))
+            if options['fail_on_scan']:
+                raise CommandError(f'{len(scans)} hot queries do full table scans')
+        else:
+            self.stdout.write(self.style.SUCCESS('No hot query does a full table scan'))
+
+    def explain_all(self):
+        user_id = Order.objects.values_list('user_id', flat=True).first() or 1
+        product_id = Product.objects.values_list('pk', flat=True).first() or 1
+        order_ids = list(Order.objects.filter(user_id=user_id).values_list('pk', flat=True)[:10]) or [1]
+
+        scans = []
+        for name, queryset, scan_allowed in representative_queries(user_id, product_id, order_ids):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  {queryset.query}')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+            if full_scans(plan) and not scan_allowed:
+                scans.append(name)
+        return scans
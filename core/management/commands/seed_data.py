@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.seeding import DEFAULT_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert synthetic users, products, carts and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--cart-lines', type=int, default=3, help='Cart lines per user')
+        parser.add_argument('--orders', type=int, default=5, help='Orders per user')
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--prefix', default='seed', help='Prefix for generated emails and names')
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        counts = seed(
+            users=options['users'],
+            products=options['products'],
+            cart_lines=options['cart_lines'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            batch_size=options['batch_size'],
+            seed_value=options['random_seed'],
+            prefix=options['prefix'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{n} {name}' for name, n in counts.items())
+        ))
+        self.stdout.write(f'Seeded users log in as {options["prefix"]}-<n>@example.com / {DEFAULT_PASSWORD}')
@@ -0,0 +1,55 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def backup(path, using='default', pages=-1):
+    """Copy ``using``'s SQLite database into ``path`` with the online backup API"""
+    source = connections[using]
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        # Replica readers hold the target's read lock between requests
+        target.execute(f'PRAGMA busy_timeout = {settings.SQLITE_PRAGMAS["busy_timeout"]}')
+        source.connection.backup(target, pages=pages)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = 'Refresh file-copied SQLite replicas of the default database (local replica routing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases',
+                            help='Replica alias to refresh (repeatable); default: every file READ_DATABASES '
+                                 'alias other than default itself')
+        parser.add_argument('--file', action='append', dest='files', default=[],
+                            help='Also copy into this file (repeatable)')
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='Pages copied per step; -1 copies everything in one step')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running, refreshing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use the database server\'s own replication')
+        primary = str(connections['default'].settings_dict['NAME'])
+        aliases = options['aliases']
+        if aliases is None:
+            aliases = [alias for alias in settings.READ_DATABASES
+                       if str(connections[alias].settings_dict['NAME']) != primary]
+        paths = [str(connections[alias].settings_dict['NAME']) for alias in aliases] + options['files']
+        if not paths:
+            raise CommandError('No replica to refresh: set SQLITE_REPLICA, or pass --database or --file')
+        if primary in paths:
+            raise CommandError('Refusing to copy the default database onto itself')
+        while True:
+            for path in paths:
+                start = time.perf_counter()
+                backup(path, pages=options['pages'])
+                self.stdout.write(f'Copied default to {path} in {(time.perf_counter() - start) * 1000:.0f} ms')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
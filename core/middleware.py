@@ -0,0 +1,130 @@
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .db.routers import SAFE_METHODS, known_user, pin_to_primary, read_route_for, route_reads
+from .instrumentation import aexecute_wrapper, execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more queries than its view allows"""
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook that counts executed queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get_query_budget(view_class, method):
+    """``query_budget`` is either one limit for every method or a dict per method"""
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Check every request against its view's ``query_budget``.
+
+    Views opt in by declaring ``query_budget = <max queries>`` or a dict of
+    budgets keyed by HTTP method. Requests that
+    go over it are logged, or fail with ``QueryBudgetExceeded`` when
+    ``QUERY_BUDGET_RAISE`` is set. Meant for development and tests: the
+    middleware disables itself unless ``QUERY_BUDGET_ENABLED`` is true.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        with execute_wrapper(counter):
+            response = self.get_response(request)
+        self.check(request, counter.count)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        async with aexecute_wrapper(counter):
+            response = await self.get_response(request)
+        self.check(request, counter.count)
+        return response
+
+    def check(self, request, count):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return
+        view_class = getattr(match.func, 'view_class', match.func)
+        budget = get_query_budget(view_class, request.method)
+        if budget is not None and count > budget:
+            message = '%s %s ran %d queries, budget is %d' % (
+                request.method, request.path, count, budget
+            )
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+class ReadDatabaseMiddleware:
+    """
+    Route the reads of safe requests to views with ``read_database = True``
+    to ``READ_DATABASES``, and pin users who just wrote to ``default``; see
+    ``core.db.routers``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'READ_DATABASES', None):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            route_reads(None)
+        self.record_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            route_reads(None)
+        self.record_write(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Not reset through a token: under ASGI this may run in a copied context
+        route_reads(read_route_for(request))
+
+    def record_write(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = known_user(request)
+        if user is not None:
+            pin_to_primary(user.pk)
@@ -0,0 +1,89 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class SizedPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class AsyncPageNumberPagination(SizedPageNumberPagination):
+    """``SizedPageNumberPagination`` counting with ``acount()`` for async views"""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """The page's slice of ``queryset``, not yet evaluated, or ``None``"""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.request = request
+        return self.page.object_list
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination without a COUNT query.
+
+    Pages are fetched with ``WHERE key < :position ORDER BY key LIMIT n`` so
+    deep pages cost the same as the first one. Clients that need the total
+    can ask for it with ``?include_total=true``.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'include_total'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.total_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+            response.data.move_to_end('count', last=False)
+        return response
+
+
+class OptInKeysetPagination(BasePagination):
+    """
+    Page number pagination by default, keyset pagination on request.
+
+    Clients opt in with ``?pagination=keyset`` (and keep following the
+    returned ``next`` links, which carry a ``cursor``). Views declare the
+    keyset ordering through ``keyset_ordering``; it must be unique or end
+    with the primary key.
+    """
+    query_param = 'pagination'
+    page_number_class = SizedPageNumberPagination
+    keyset_class = KeysetPagination
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.query_param) == 'keyset'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.paginator = self.keyset_class()
+            self.paginator.ordering = getattr(view, 'keyset_ordering', self.paginator.ordering)
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
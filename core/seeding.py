@@ -0,0 +1,94 @@
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from cart.models import Cart, CartSummary
+from orders.models import Order, OrderItem
+from products.cache import invalidate_products
+from products.models import Product
+from users.models import User
+
+DEFAULT_PASSWORD = 'bench-pass-123'
+
+
+def _batched(objects, batch_size):
+    for start in range(0, len(objects), batch_size):
+        yield objects[start:start + batch_size]
+
+
+def seed(users=100, products=1000, cart_lines=3, orders=5, items_per_order=3,
+         batch_size=2000, seed_value=0, prefix='seed'):
+    """
+    Bulk-insert synthetic users, products, carts and orders.
+
+    ``cart_lines`` and ``orders`` are per user. All users share one
+    password hash, so seeding doesn't spend its time in PBKDF2. Returns a
+    dict with the number of rows created per model.
+    """
+    rng = random.Random(seed_value)
+    password = make_password(DEFAULT_PASSWORD)
+
+    user_rows = User.objects.bulk_create(
+        [User(email=f'{prefix}-{i}@example.com', password=password) for i in range(users)],
+        batch_size=batch_size
+    )
+    product_rows = []
+    for batch in _batched(range(products), batch_size):
+        product_rows += Product.objects.bulk_create([
+            Product(
+                name=f'{prefix.title()} product {i}',
+                description=f'Synthetic product number {i}',
+                price=Decimal(rng.randint(100, 100000)) / 100,
+                stock=rng.randint(0, 500)
+            )
+            for i in batch
+        ])
+    # SQLite returns primary keys from bulk inserts; reload them where it doesn't
+    if product_rows and product_rows[0].pk is None:
+        product_rows = list(Product.objects.order_by('-id')[:products])[::-1]
+    if user_rows and user_rows[0].pk is None:
+        user_rows = list(User.objects.filter(email__startswith=f'{prefix}-'))
+
+    invalidate_products()
+
+    lines = []
+    summaries = []
+    for user in user_rows:
+        chosen = rng.sample(product_rows, min(cart_lines, len(product_rows)))
+        quantities = [rng.randint(1, 5) for _ in chosen]
+        lines += [Cart(user=user, product=p, quantity=q) for p, q in zip(chosen, quantities)]
+        summaries.append(CartSummary(
+            user=user, item_count=sum(quantities), line_count=len(chosen),
+            subtotal=sum(p.price * q for p, q in zip(chosen, quantities))
+        ))
+    Cart.objects.bulk_create(lines, batch_size=batch_size)
+    CartSummary.objects.bulk_create(summaries, batch_size=batch_size)
+
+    order_rows = []
+    order_items = []
+    for user in user_rows:
+        for i in range(orders):
+            chosen = rng.sample(product_rows, min(items_per_order, len(product_rows)))
+            order = Order(
+                user=user,
+                order_number=f'{prefix[:4].upper()}{user.pk:08d}{i:04d}',
+                total_amount=sum(p.price for p in chosen),
+                status=rng.choice(Order.Status.values),
+            )
+            order_rows.append(order)
+            order_items.append([
+                OrderItem(order=order, product=p, quantity=1, price=p.price, subtotal=p.price)
+                for p in chosen
+            ])
+    Order.objects.bulk_create(order_rows, batch_size=batch_size)
+    items = [item for group in order_items for item in group]
+    for item in items:
+        item.order_id = item.order.pk
+    OrderItem.objects.bulk_create(items, batch_size=batch_size)
+
+    return {
+        'users': len(user_rows),
+        'products': len(product_rows),
+        'cart_lines': len(lines),
+        'orders': len(order_rows),
+        'order_items': len(items),
+    }
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .middleware import get_query_budget
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin for asserting upper bounds on query counts"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=None):
+        conn = connection if using is None else using
+        with CaptureQueriesContext(conn) as ctx:
+            yield ctx
+        executed = len(ctx.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                '%d. %s' % (i, query['sql']) for i, query in enumerate(ctx.captured_queries, start=1)
+            )
+            self.fail('%d queries executed, budget is %d\nCaptured queries were:\n%s' % (
+                executed, budget, queries
+            ))
+
+    def assertWithinQueryBudget(self, view_class, method='GET', using=None):
+        """Context manager checking the block against ``view_class.query_budget``"""
+        return self.assertMaxQueries(get_query_budget(view_class, method), using=using)
@@ -0,0 +1,376 @@
+import asyncio
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from cart.models import Cart
+from cart.views import AsyncCartListView, CartListView
+from orders.models import Order, OrderItem
+from orders.views import AsyncOrderDetailView, AsyncOrderListView
+from products.cache import _timeout as cache_timeout, list_cache_key
+from products.models import Product
+from products.views import AsyncProductDetailView, AsyncProductListView, ProductListCreateView
+from users.models import User
+from users.tokens import ClaimsRefreshToken
+from .asyncviews import select_view
+from .db.routers import ReadDatabaseRouter, ReadRoute, pin_key, reading_from, route_reads
+from .idempotency import begin
+from .instrumentation import aexecute_wrapper, registry
+from .loadtest import async_views, compare_runs
+from .middleware import QueryCounter
+from .models import IdempotencyKey
+
+
+class ExplainQueriesTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_queries', '--seed', '--users=20', '--products=200', '--fail-on-scan', stdout=out)
+        self.assertIn('No hot query does a full table scan', out.getvalue())
+
+
+class BenchApiSmokeTests(SimpleTestCase):
+    def test_login_then_browse_without_errors(self):
+        # In a subprocess: benchmark_database sets up its own test environment
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'bench_api', '--scenarios', 'login', 'browse', '--concurrency', '1', '2',
+             '--requests', '10', '--products', '50'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        rows = [line.split() for line in result.stdout.splitlines() if line.startswith(('login', 'browse'))]
+        self.assertEqual([(row[0], row[1]) for row in rows],
+                         [('login', '1'), ('login', '2'), ('browse', '1'), ('browse', '2')])
+        self.assertEqual({row[-1] for row in rows}, {'0'})
+
+
+class BenchCheckoutSmokeTests(SimpleTestCase):
+    def test_both_profiles_run(self):
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'bench_checkout', '--concurrency', '2', '--readers', '1',
+             '--requests', '20', '--products', '50'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        rows = {line.split()[0]: line.split() for line in result.stdout.splitlines()
+                if line.startswith(('baseline', 'tuned'))}
+        self.assertEqual(set(rows), {'baseline', 'tuned'})
+        # errors, locked and reader errors
+        self.assertEqual((rows['tuned'][5], rows['tuned'][6], rows['tuned'][-1]), ('0', '0', '0'))
+
+
+class CompareRunsTests(TestCase):
+    def test_flags_slowdowns_beyond_tolerance(self):
+        def run(p95, queries):
+            return {'results': [{'scenario': 'browse', 'concurrency': 4, 'p95_ms': p95,
+                                 'queries_per_request': queries}]}
+        self.assertEqual(compare_runs(run(11.0, 2.0), run(10.0, 2.0), tolerance=0.2), [])
+        self.assertEqual(len(compare_runs(run(13.0, 3.0), run(10.0, 2.0), tolerance=0.2)), 2)
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1.0)
+class PerformanceInstrumentationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.product = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=1)
+        self.admin = User.objects.create_user(email='admin@example.com', password='pass12345', role='admin')
+        self.customer = User.objects.create_user(email='customer@example.com', password='pass12345')
+
+    def test_server_timing_and_metrics(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(reverse('product-detail', args=[self.product.pk]))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_authenticate(self.admin)
+        metrics = self.client.get(reverse('metrics')).data['product-detail']
+        self.assertEqual(metrics['count'], 1)
+        self.assertGreater(metrics['avg_serialize_ms'], 0)
+        self.assertGreater(metrics['avg_bytes'], 0)
+        self.assertEqual(sum(metrics['histogram'].values()), 1)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(reverse('product-detail', args=[self.product.pk]))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot(), {})
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        products = Product.objects.bulk_create([
+            Product(name=f'P{i}', description='', price=Decimal('2.50'), stock=10) for i in range(15)
+        ])
+        Cart.objects.bulk_create([Cart(user=self.user, product=product, quantity=2) for product in products[:12]])
+        for _ in range(3):
+            order = Order.objects.create(user=self.user, total_amount=Decimal('5.00'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price, subtotal=product.price)
+                for product in products[:2]
+            ])
+        self.order = order
+        self.product = products[0]
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.auth = {'headers': {'Authorization': f'Bearer {access}'}}
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view_class, path, **kwargs):
+        request = self.factory.get(path, **self.auth)
+        counter = QueryCounter()
+        async with aexecute_wrapper(counter):
+            response = await view_class.as_view()(request, **kwargs)
+        return response, counter.count
+
+    async def test_responses_match_sync_views(self):
+        cases = [
+            (AsyncProductListView, '/api/products/?page=2', {}, 3),
+            (AsyncProductListView, '/api/products/?search=p1&in_stock=true', {}, 3),
+            (AsyncProductDetailView, f'/api/products/{self.product.pk}/', {'pk': self.product.pk}, 2),
+            (AsyncCartListView, '/api/cart/?page_size=5', {}, 3),
+            (AsyncOrderListView, '/api/orders/', {}, 4),
+            (AsyncOrderDetailView, f'/api/orders/{self.order.pk}/', {'pk': self.order.pk}, 3),
+        ]
+        for view_class, path, kwargs, budget in cases:
+            await cache.aclear()
+            response, queries = await self.call(view_class, path, **kwargs)
+            await cache.aclear()
+            expected = await self.async_client.get(path, **self.auth)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.content, expected.content, path)
+            self.assertLessEqual(queries, budget, path)
+
+    async def test_keyset_and_writes_use_sync_view(self):
+        response, _ = await self.call(AsyncCartListView, '/api/cart/?pagination=keyset&page_size=5')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertNotIn('count', response.data)
+
+    async def test_authentication_and_missing_objects(self):
+        response = await AsyncOrderListView.as_view()(self.factory.get('/api/orders/'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response, _ = await self.call(AsyncOrderDetailView, '/api/orders/0/', pk=0)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b'{"detail":"Not found."}')
+        response, _ = await self.call(AsyncProductListView, '/api/products/?page=99')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_middleware_counts_queries(self):
+        response = await self.async_client.get('/api/products/', **self.auth)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=0)
+    async def test_concurrent_requests_count_only_their_queries(self):
+        def queries(response):
+            return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+        with async_views(['product-list']):
+            # The first request also caches the user's auth state
+            await self.async_client.get('/api/products/', **self.auth)
+            alone = queries(await self.async_client.get('/api/products/', **self.auth))
+            responses = await asyncio.gather(*[self.async_client.get('/api/products/', **self.auth)
+                                               for _ in range(8)])
+        self.assertEqual([queries(response) for response in responses], [alone] * 8)
+
+    def test_routes_select_views_by_setting(self):
+        with override_settings(ASYNC_VIEWS=['product-list']):
+            self.assertIs(select_view('product-list', ProductListCreateView, AsyncProductListView).view_class,
+                          AsyncProductListView)
+            self.assertIs(select_view('cart-list', CartListView, AsyncCartListView).view_class, CartListView)
+
+
+class DatabaseTuningTests(TransactionTestCase):
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_transactions_begin_immediate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Product.objects.exists()
+        self.assertEqual(ctx.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class ReadRoutingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def test_router(self):
+        router = ReadDatabaseRouter()
+        with reading_from('read'):
+            # The in-memory test mirror can't see this test's transaction
+            self.assertIsNone(router.db_for_read(Product))
+        with mock.patch('core.db.routers.usable', return_value=True), reading_from('read'):
+            self.assertEqual(router.db_for_read(Product), 'read')
+            self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertIsNone(router.db_for_read(Product))
+        self.assertFalse(router.allow_migrate('read', 'products'))
+
+    def test_only_safe_requests_to_read_views_are_routed(self):
+        with mock.patch('core.middleware.route_reads', wraps=route_reads) as route:
+            self.client.get(reverse('product-list'))
+            self.assertIsInstance(route.call_args_list[0].args[0], ReadRoute)
+            self.assertEqual(route.call_args_list[0].args[0].aliases, ['read'])
+            route.reset_mock()
+            self.client.post(reverse('order-create'), {})
+            self.client.patch(reverse('order-cancel', args=[1]), {})
+            self.client.get(reverse('cart-list'))
+        self.assertEqual({call.args[0] for call in route.call_args_list}, {None})
+
+    def test_replica_picked_once_per_request(self):
+        route = ReadRoute(['replica-a', 'replica-b'])
+        with mock.patch('core.db.routers.usable', return_value=True):
+            self.assertEqual({route.resolve() for _ in range(20)}, {route.alias})
+        self.assertIsNone(ReadRoute(['read']).resolve())
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=30)
+    def test_writers_read_their_writes_from_default(self):
+        cache.clear()
+        product = Product.objects.create(name='Lamp', description='Desk lamp', price=Decimal('10.00'), stock=5)
+        request = AsyncRequestFactory().get('/')
+        route = ReadRoute(['read'], request)
+        with mock.patch('core.db.routers.usable', return_value=True):
+            # Reads before authentication resolves the user may use the replica
+            self.assertEqual(route.resolve(), 'read')
+            request.user = self.user
+            self.assertEqual(route.resolve(), 'read')
+            self.client.post(reverse('cart-list'), {'product': product.pk, 'quantity': 1}, format='json')
+            self.assertTrue(cache.get(pin_key(self.user.pk)))
+            self.assertIsNone(ReadRoute(['read'], request).resolve())
+            other = User.objects.create_user(email='other@example.com', password='pass12345')
+            request.user = other
+            self.assertEqual(ReadRoute(['read'], request).resolve(), 'read')
+
+    def test_lagging_replica_pages_cached_apart(self):
+        request = AsyncRequestFactory().get('/api/products/')
+        primary = list_cache_key(request)
+        read = connections['read'].settings_dict
+        with mock.patch('core.db.routers.usable', return_value=True):
+            with reading_from('read'):
+                # Same file as default: nothing to lag behind
+                self.assertEqual(list_cache_key(request), primary)
+            with mock.patch.dict(read, NAME='replica.sqlite3'), reading_from('read'):
+                self.assertEqual(list_cache_key(request), primary + ':replica')
+                with override_settings(READ_YOUR_WRITES_SECONDS=5):
+                    self.assertEqual(cache_timeout(), 5)
+
+    def test_failed_writes_do_not_pin(self):
+        cache.clear()
+        self.client.post(reverse('order-create'), {}, format='json')
+        self.assertIsNone(cache.get(pin_key(self.user.pk)))
+
+
+class SyncReplicaTests(TransactionTestCase):
+    def test_copies_default_into_file(self):
+        Product.objects.create(name='Lamp', description='Desk lamp', price=Decimal('10.00'), stock=5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            call_command('sync_replica', files=[path], stdout=StringIO())
+            replica = sqlite3.connect(path)
+            try:
+                names = replica.execute('SELECT name FROM products_product').fetchall()
+            finally:
+                replica.close()
+        self.assertEqual(names, [('Lamp',)])
+
+    def test_requires_a_replica(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=StringIO())
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Lamp', description='Desk lamp', price=Decimal('10.00'), stock=5)
+
+    def checkout(self, key='order-1', **data):
+        return self.client.post(reverse('order-create'), {'shipping_address': 'Dhaka', **data}, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_checkout_replays_without_touching_stock_or_cart(self):
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+        first = self.checkout()
+        self.assertEqual(first.status_code, 201)
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self.checkout()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(any('products_product' in q['sql'] or 'cart_cart' in q['sql']
+                             for q in ctx.captured_queries))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_error_responses_are_replayed_too(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+        self.assertEqual(self.checkout().data, {'error': 'Cart is empty'})
+        self.assertEqual(self.checkout(key='order-2').status_code, 201)
+
+    def test_key_reused_for_another_request(self):
+        self.checkout()
+        self.assertEqual(self.checkout(shipping_address='Chittagong').status_code, 422)
+
+    def test_duplicate_while_first_is_running(self):
+        begin(self.user, 'order-1', 'digest')
+        with mock.patch('core.idempotency.request_hash', return_value='digest'):
+            self.assertEqual(self.checkout().status_code, 409)
+            # Until the first request is presumed dead
+            IdempotencyKey.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(self.checkout().status_code, 400)
+
+    def test_exceptions_release_the_key(self):
+        with mock.patch('cart.views.apply_cart_operations', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('cart-batch'), {'operations': [
+                    {'op': 'add', 'product': self.product.pk, 'quantity': 1}
+                ]}, format='json', HTTP_IDEMPOTENCY_KEY='batch-1')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_cart_add_replay(self):
+        url = reverse('cart-list')
+        for _ in range(2):
+            response = self.client.post(url, {'product': self.product.pk, 'quantity': 2}, format='json',
+                                        HTTP_IDEMPOTENCY_KEY='add-1')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 2)
+        # Without a key every request counts
+        self.client.post(url, {'product': self.product.pk, 'quantity': 2}, format='json')
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 4)
+
+    def test_expired_keys_start_over_and_are_purged(self):
+        self.checkout()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+        self.assertEqual(self.checkout().status_code, 201)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Purged 1 expired idempotency keys')
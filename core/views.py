@@ -0,0 +1,12 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from users.permissions import IsAdmin
+from .instrumentation import registry
+
+
+class MetricsView(APIView):
+    """Rolling per-view latency, DB and serialization metrics (Admin only)"""
+    permission_classes = [IsAdmin]
+    
+    def get(self, request):
+        return Response(registry.snapshot())
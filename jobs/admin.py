@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'key', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    readonly_fields = ('kind', 'key', 'payload', 'attempts', 'locked_by', 'locked_until', 'last_error',
+                       'created_at', 'finished_at')
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.PENDING, run_at=timezone.now(), attempts=0, finished_at=None
+        )
+        self.message_user(request, f'{count} jobs queued again')
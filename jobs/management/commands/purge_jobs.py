@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from jobs.queue import purge_finished
+
+
+class Command(BaseCommand):
+    help = 'Delete jobs that finished successfully more than --days ago, in bounded batches (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=7)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted = purge_finished(before, batch_size=options['batch_size'])
+        self.stdout.write(f'Purged {deleted} finished jobs')
@@ -0,0 +1,30 @@
+import signal
+from django.core.management.base import BaseCommand
+from jobs.queue import WorkerPool, drain
+
+
+class Command(BaseCommand):
+    help = 'Run queued jobs (order confirmation and other post-processing) on a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per round trip')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle worker waits before looking for due jobs again')
+        parser.add_argument('--once', action='store_true', help='Run the jobs due now, then exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.stdout.write(f'Ran {drain(options["batch_size"])} jobs')
+            return
+        pool = WorkerPool(options['workers'], options['batch_size'], options['poll_interval'])
+        # Finish the jobs in hand, then exit
+        signal.signal(signal.SIGTERM, lambda *args: pool.stop())
+        pool.start()
+        self.stdout.write(f'Running jobs on {options["workers"]} workers')
+        try:
+            while not pool.join(timeout=1):
+                pass
+        except KeyboardInterrupt:
+            pool.stop()
+            pool.join()
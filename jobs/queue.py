@@ -0,0 +1,193 @@
+"""
+Durable outbox job queue.
+
+``enqueue`` writes a job row in the caller's transaction, so a job exists
+exactly when the change that caused it commits, and never slows the
+request down by more than one INSERT. Workers (``manage.py run_jobs``)
+claim due jobs in batches with conditional UPDATEs, run each job's
+handler in its own transaction, and retry failures with exponential
+backoff until ``max_attempts``.
+
+Delivery is at least once: a worker that dies mid-job leaves a lease that
+runs out after ``JOB_LEASE_SECONDS``, and the job runs again, so handlers
+must be idempotent (conditional updates, further jobs enqueued under
+fixed keys).
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class LeaseLost(Exception):
+    """Raised when a job's lease ran out and another worker claimed it"""
+
+
+def handler(kind, atomic=True):
+    """
+    Register the decorated function as the handler of ``kind`` jobs.
+
+    It is called with the job's payload as keyword arguments. With
+    ``atomic`` its writes commit together with the job's completion; pass
+    ``atomic=False`` for handlers that talk to slow external services, so
+    they don't hold the database's write lock meanwhile.
+    """
+    def register(func):
+        HANDLERS[kind] = (func, atomic)
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Queue a ``kind`` job; a job already queued under ``key`` makes this a no-op"""
+    Job.objects.bulk_create([Job(
+        kind=kind,
+        key=key or f'{kind}:{uuid.uuid4().hex}',
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )], ignore_conflicts=True)
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: doubling, capped, with jitter"""
+    base = getattr(settings, 'JOB_BACKOFF_SECONDS', 5)
+    cap = getattr(settings, 'JOB_BACKOFF_MAX_SECONDS', 3600)
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+
+def claim(limit=10):
+    """Lease up to ``limit`` due jobs (or jobs whose lease ran out) to a new claim token"""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    fields = {
+        'status': Job.Status.RUNNING,
+        'locked_by': token,
+        'locked_until': now + timedelta(seconds=getattr(settings, 'JOB_LEASE_SECONDS', 300)),
+        'attempts': F('attempts') + 1,
+    }
+    claimed = 0
+    # Two conditions rather than one OR, so the pending batch is read in
+    # (status, run_at) index order instead of sorting the whole backlog
+    for due, order in [(Q(status=Job.Status.RUNNING, locked_until__lt=now), 'locked_until'),
+                       (Q(status=Job.Status.PENDING, run_at__lte=now), 'run_at')]:
+        if claimed < limit:
+            batch = Job.objects.filter(due).order_by(order).values('pk')[:limit - claimed]
+            # ``due`` is repeated outside the subquery so that concurrent
+            # claims re-check each row and never take the same job twice
+            claimed += Job.objects.filter(due, pk__in=batch).update(**fields)
+    if not claimed:
+        return []
+    return list(Job.objects.filter(locked_by=token, status=Job.Status.RUNNING).order_by('run_at', 'id'))
+
+
+def _finish(job, **fields):
+    return Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Job.Status.RUNNING).update(
+        locked_until=None, **fields
+    )
+
+
+def run(job):
+    """Run a claimed job; returns whether it succeeded"""
+    func, atomic = HANDLERS.get(job.kind, (None, True))
+    try:
+        if func is None:
+            raise LookupError(f'No handler registered for {job.kind!r} jobs')
+        with transaction.atomic() if atomic else nullcontext():
+            func(**job.payload)
+            if not _finish(job, status=Job.Status.DONE, finished_at=timezone.now(), last_error=''):
+                raise LeaseLost(job.pk)
+    except LeaseLost:
+        logger.warning('Lease on job %s ran out before it finished', job.pk)
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.exception('Job %s (%s) failed for good after %s attempts', job.pk, job.kind, job.attempts)
+            _finish(job, status=Job.Status.FAILED, finished_at=timezone.now(), last_error=error)
+        else:
+            logger.warning('Job %s (%s) failed, retrying', job.pk, job.kind, exc_info=True)
+            _finish(job, status=Job.Status.PENDING,
+                    run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)), last_error=error)
+        return False
+    return True
+
+
+def run_due(batch_size=10):
+    """Claim and run one batch of due jobs; returns how many were claimed"""
+    jobs = claim(batch_size)
+    for job in jobs:
+        run(job)
+    return len(jobs)
+
+
+def drain(batch_size=10):
+    """Run due jobs until none are left; returns how many ran"""
+    total = 0
+    while True:
+        count = run_due(batch_size)
+        if not count:
+            return total
+        total += count
+
+
+def purge_finished(before, batch_size=1000):
+    """Delete jobs done before ``before`` in bounded batches; returns how many"""
+    deleted = 0
+    while True:
+        ids = list(Job.objects.filter(status=Job.Status.DONE, finished_at__lt=before)
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
+
+
+class WorkerPool:
+    """Threads that claim and run due jobs, polling when the queue is empty"""
+
+    def __init__(self, workers=2, batch_size=10, poll_interval=1.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    ran = run_due(self.batch_size)
+                except Exception:
+                    # e.g. the database stayed locked past busy_timeout
+                    logger.exception('Could not claim jobs')
+                    ran = 0
+                if not ran:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.loop, name=f'jobs-{i}') for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+        return not any(thread.is_alive() for thread in self.threads)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from products.models import Product
+from .models import Job
+from .queue import HANDLERS, claim, drain, enqueue, purge_finished, run
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.dict(HANDLERS, {
+            'test.record': (lambda value: self.calls.append(value), True),
+            'test.fail': (self.fail_job, True),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_job(self, name):
+        Product.objects.create(name=name, description='Rolled back', price=1, stock=1)
+        raise RuntimeError('boom')
+
+    def test_enqueue_is_idempotent_by_key(self):
+        enqueue('test.record', {'value': 1}, key='once')
+        enqueue('test.record', {'value': 2}, key='once')
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(drain(), 1)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+
+    def test_delayed_jobs_wait(self):
+        enqueue('test.record', {'value': 1}, delay=60)
+        self.assertEqual(drain(), 0)
+
+    @override_settings(JOB_BACKOFF_SECONDS=10)
+    def test_failures_retry_with_backoff_then_fail(self):
+        enqueue('test.fail', {'name': 'Lamp'}, max_attempts=2)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(drain(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        # The handler's writes were rolled back with it
+        self.assertFalse(Product.objects.exists())
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unknown_kind_fails(self):
+        enqueue('test.missing', max_attempts=1)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            drain()
+        self.assertIn('No handler', Job.objects.get(status=Job.Status.FAILED).last_error)
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue('test.record', {'value': 1})
+        [job] = claim()
+        self.assertEqual(claim(), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [again] = claim()
+        self.assertEqual((again.pk, again.attempts), (job.pk, 2))
+        # The first worker lost the job: its result is discarded
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(run(job))
+        self.assertEqual(self.calls, [1])
+        self.assertTrue(run(again))
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+
+    def test_purge_finished(self):
+        enqueue('test.record', {'value': 1})
+        enqueue('test.record', {'value': 2}, delay=60)
+        drain()
+        self.assertEqual(purge_finished(timezone.now() + timedelta(seconds=1), batch_size=1), 1)
+        self.assertEqual(list(Job.objects.values_list('status', flat=True)), [Job.Status.PENDING])
+
+    def test_run_jobs_once(self):
+        enqueue('test.record', {'value': 1})
+        out = StringIO()
+        call_command('run_jobs', once=True, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Ran 1 jobs')
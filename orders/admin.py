@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Order, OrderItem
+from .services import cancel_orders
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -12,4 +13,10 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('order_number', 'user__email')
     readonly_fields = ('order_number', 'total_amount', 'created_at', 'updated_at')
-    inlines = [OrderItemInline]
\ No newline at end of file
+    inlines = [OrderItemInline]
+    actions = ['cancel_selected']
+
+    @admin.action(description='Cancel selected pending orders and restock')
+    def cancel_selected(self, request, queryset):
+        count = cancel_orders(queryset)
+        self.message_user(request, f'{count} orders cancelled')
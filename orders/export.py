@@ -0,0 +1,149 @@
+"""
+Streaming export of orders with their items.
+
+Orders are read in keyset batches on ``(created_at, id)`` - never with
+OFFSET, never all at once - and each batch's items in one extra query, so
+memory stays flat however many orders match. Every batch is encoded and
+handed to the caller as soon as it is read; a CSV header goes out before
+the first query runs.
+"""
+import csv
+import io
+import itertools
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
+from core.projections import datetime_renderer, decimal_renderer
+from .models import Order, OrderItem
+
+ORDER_FIELDS = ['id', 'order_number', 'user', 'user__email', 'status', 'total_amount',
+                'payment_method', 'shipping_address', 'created_at', 'updated_at']
+ITEM_FIELDS = ['id', 'order', 'product', 'product__name', 'quantity', 'price', 'subtotal']
+
+CSV_HEADER = ['order_id', 'order_number', 'user_id', 'user_email', 'status', 'total_amount',
+              'payment_method', 'shipping_address', 'created_at', 'updated_at',
+              'item_id', 'product_id', 'product_name', 'quantity', 'price', 'subtotal']
+
+
+def export_queryset(status=None, created_after=None, created_before=None):
+    """Orders matching the filters, oldest first; served by the status/created_at indexes"""
+    queryset = Order.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if created_after:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before:
+        queryset = queryset.filter(created_at__lt=created_before)
+    return queryset.order_by('created_at', 'id')
+
+
+def order_batches(queryset, batch_size=1000):
+    """Yield ``(orders, items by order id)`` for keyset batches of ``queryset``"""
+    position = None
+    while True:
+        page = queryset
+        if position is not None:
+            created_at, pk = position
+            # A range on created_at, not an OR, so SQLite keeps walking the index
+            page = page.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=pk)
+        orders = list(page.values(*ORDER_FIELDS)[:batch_size])
+        if not orders:
+            return
+        items = {order['id']: [] for order in orders}
+        item_rows = (
+            OrderItem.objects.filter(order__in=list(items)).order_by('order', 'id')
+            .values(*ITEM_FIELDS).iterator(chunk_size=batch_size)
+        )
+        for item in item_rows:
+            items[item['order']].append(item)
+        yield orders, items
+        if len(orders) < batch_size:
+            return
+        position = (orders[-1]['created_at'], orders[-1]['id'])
+
+
+class Rows:
+    """Orders and items as plain dicts, values rendered like the API renders them"""
+
+    def __init__(self):
+        self.total = decimal_renderer(12, 2)
+        self.price = decimal_renderer(10, 2)
+        self.datetime = datetime_renderer()
+
+    def order(self, order):
+        return {
+            'id': order['id'],
+            'order_number': order['order_number'],
+            'user': order['user'],
+            'user_email': order['user__email'],
+            'status': order['status'],
+            'total_amount': self.total(order['total_amount']),
+            'payment_method': order['payment_method'],
+            'shipping_address': order['shipping_address'],
+            'created_at': self.datetime(order['created_at']),
+            'updated_at': self.datetime(order['updated_at']),
+        }
+
+    def item(self, item):
+        return {
+            'id': item['id'],
+            'product': item['product'],
+            'product_name': item['product__name'],
+            'quantity': item['quantity'],
+            'price': self.price(item['price']),
+            'subtotal': self.price(item['subtotal']),
+        }
+
+
+def csv_chunks(queryset, batch_size=1000):
+    """CSV, one line per order item (orders without items get one line)"""
+    rows = Rows()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue().encode()
+    for orders, items in order_batches(queryset, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        for order in orders:
+            values = list(rows.order(order).values())
+            lines = [list(rows.item(item).values()) for item in items[order['id']]]
+            for line in lines or [[''] * 6]:
+                writer.writerow(values + line)
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(queryset, batch_size=1000):
+    """Newline-delimited JSON, one object per order with its items nested"""
+    rows = Rows()
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for orders, items in order_batches(queryset, batch_size):
+        lines = []
+        for order in orders:
+            data = rows.order(order)
+            data['items'] = [rows.item(item) for item in items[order['id']]]
+            lines.append(encoder.encode(data))
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+FORMATS = {
+    'csv': (csv_chunks, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson'),
+}
+
+
+async def aiterate(chunks, prefetch=4):
+    """
+    Serve a sync chunk iterator to an ASGI response.
+
+    Django would otherwise drain a sync iterator into a list before sending
+    anything; here a few chunks at a time are pulled on the request's
+    worker thread.
+    """
+    chunks = iter(chunks)
+    pull = sync_to_async(lambda: list(itertools.islice(chunks, prefetch)))
+    while True:
+        batch = await pull()
+        if not batch:
+            return
+        for chunk in batch:
+            yield chunk
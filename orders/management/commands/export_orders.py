@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from orders.export import FORMATS, export_queryset
+from orders.serializers import OrderExportSerializer
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their items as CSV or NDJSON, in keyset batches with flat memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--status')
+        parser.add_argument('--created-after', help='ISO date or datetime, inclusive')
+        parser.add_argument('--created-before', help='ISO date or datetime, exclusive')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--output', help='File to write to instead of stdout')
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in ('format', 'status', 'created_after', 'created_before')
+                  if options[name] is not None}
+        serializer = OrderExportSerializer(data=params)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        filters = dict(serializer.validated_data)
+        chunks = FORMATS[filters.pop('format')][0](export_queryset(**filters), options['batch_size'])
+
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -22,6 +22,18 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Order history: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Cancellation: WHERE user_id = ? AND status = 'pending'
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            # Admin status filter, newest first
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            # Admin date filter
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+        ]
+    
     def __str__(self):
         return f'Order {self.order_number}'
     
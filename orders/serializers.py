@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from core.instrumentation import span
+from core.projections import Projection, datetime_renderer, decimal_renderer
 from .models import Order, OrderItem
-from products.serializers import ProductSerializer
+from products.serializers import ProductProjection, ProductSerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_detail = ProductSerializer(source='product', read_only=True)
@@ -20,4 +22,100 @@ class OrderSerializer(serializers.ModelSerializer):
 
 class CreateOrderSerializer(serializers.Serializer):
     shipping_address = serializers.CharField(required=False)
-    payment_method = serializers.CharField(required=False, default='COD')
\ No newline at end of file
+    payment_method = serializers.CharField(required=False, default='COD')
+
+class OrderExportSerializer(serializers.Serializer):
+    """Query parameters of the order export"""
+    format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    status = serializers.ChoiceField(choices=Order.Status.choices, required=False)
+    created_after = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+    created_before = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+
+    def validate(self, attrs):
+        after, before = attrs.get('created_after'), attrs.get('created_before')
+        if after and before and after >= before:
+            raise serializers.ValidationError({'created_before': 'Must be later than created_after.'})
+        return attrs
+
+
+class OrderBulkCancelSerializer(serializers.Serializer):
+    """Which pending orders to cancel; at least one filter is required"""
+    order_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=10000,
+                                      allow_empty=False, required=False)
+    payment_method = serializers.CharField(required=False, allow_blank=False)
+    created_after = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+    created_before = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Give order_ids, payment_method or a created_* range.')
+        after, before = attrs.get('created_after'), attrs.get('created_before')
+        if after and before and after >= before:
+            raise serializers.ValidationError({'created_before': 'Must be later than created_after.'})
+        return attrs
+
+
+class OrderProjection(Projection):
+    """
+    Read-only equivalent of ``OrderSerializer``.
+
+    Items for a whole page of orders are fetched, joined with their
+    products, in a single extra query.
+    """
+    source_fields = ['id', 'order_number', 'user', 'total_amount', 'status',
+                     'shipping_address', 'payment_method', 'created_at', 'updated_at']
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.product = ProductProjection(request, prefix='product__')
+        self.item_fields = ['id', 'order', 'product', 'quantity', 'price', 'subtotal'] + self.product.source_fields
+        self.render_total = decimal_renderer(12, 2)
+        self.render_price = decimal_renderer(10, 2)
+        self.render_datetime = datetime_renderer()
+
+    def items(self, rows):
+        return (
+            OrderItem.objects.filter(order__in=[row['id'] for row in rows])
+            .order_by('order', 'id')
+            .values(*self.item_fields)
+        )
+
+    def render(self, rows):
+        rows = list(rows)
+        return self.render_page(rows, list(self.items(rows)) if rows else [])
+
+    async def arender(self, queryset):
+        rows = [row async for row in queryset.aiterator()]
+        item_rows = [item async for item in self.items(rows).aiterator()] if rows else []
+        return self.render_page(rows, item_rows)
+
+    def render_page(self, rows, item_rows):
+        items = {row['id']: [] for row in rows}
+        with span('serialize'):
+            for item in item_rows:
+                items[item['order']].append(self.render_item(item))
+            return [self.render_row(row, items[row['id']]) for row in rows]
+
+    def render_item(self, row):
+        return {
+            'id': row['id'],
+            'product': row['product'],
+            'product_detail': self.product.render_row(row),
+            'quantity': row['quantity'],
+            'price': self.render_price(row['price']),
+            'subtotal': self.render_price(row['subtotal']),
+        }
+
+    def render_row(self, row, items=()):
+        return {
+            'id': row['id'],
+            'order_number': row['order_number'],
+            'user': row['user'],
+            'total_amount': self.render_total(row['total_amount']),
+            'status': row['status'],
+            'shipping_address': row['shipping_address'],
+            'payment_method': row['payment_method'],
+            'items': list(items),
+            'created_at': self.render_datetime(row['created_at']),
+            'updated_at': self.render_datetime(row['updated_at']),
+        }
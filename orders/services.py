@@ -0,0 +1,160 @@
+from django.db import DatabaseError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from cart.models import Cart, CartSummary
+from products.services import release_stock, reserve_stock, StockReservationError
+from .models import Order, OrderItem
+from .tasks import queue_confirmation
+
+
+class EmptyCart(Exception):
+    """Raised when checking out an empty cart"""
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more cart lines exceed available stock"""
+
+    def __init__(self, items):
+        super().__init__('Insufficient stock for some items')
+        self.items = items
+
+
+def _insufficient_items(cart_items, stock_by_product=None):
+    items = []
+    for cart_item in cart_items:
+        product = cart_item.product
+        stock = product.stock if stock_by_product is None else stock_by_product.get(product.pk, 0)
+        if stock < cart_item.quantity:
+            items.append({
+                'product_name': product.name,
+                'requested_quantity': cart_item.quantity,
+                'available_stock': stock
+            })
+    return items
+
+
+@transaction.atomic
+def checkout(user, shipping_address='', payment_method='COD'):
+    """
+    Turn the user's cart into an order.
+
+    Runs a fixed number of queries regardless of cart size: one read of the
+    cart joined with its products, one order insert, one conditional stock
+    update covering every line (see ``reserve_stock``), one bulk insert of
+    the order items, one cart delete, a fixed-cost cart summary refresh and
+    one job insert that queues the order's confirmation (see ``orders.tasks``).
+    Any stock shortfall rolls back the whole order.
+    """
+    cart_items = list(
+        Cart.objects.filter(user=user).select_related('product').order_by('pk')
+    )
+    if not cart_items:
+        raise EmptyCart()
+
+    insufficient = _insufficient_items(cart_items)
+    if insufficient:
+        raise InsufficientStock(insufficient)
+
+    total_amount = sum(item.product.price * item.quantity for item in cart_items)
+    order = Order.objects.create(
+        user=user,
+        total_amount=total_amount,
+        shipping_address=shipping_address,
+        payment_method=payment_method
+    )
+
+    try:
+        reserve_stock({item.product_id: item.quantity for item in cart_items})
+    except StockReservationError as exc:
+        raise InsufficientStock(_insufficient_items(cart_items, exc.stock))
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=item.product,
+            quantity=item.quantity,
+            price=item.product.price,
+            subtotal=item.product.price * item.quantity
+        )
+        for item in cart_items
+    ])
+
+    Cart.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+    CartSummary.objects.refresh([user.pk])
+    queue_confirmation(order)
+
+    return order
+
+
+RETURNING_VENDORS = ('sqlite', 'postgresql')
+
+
+def _cancel_pending(ids):
+    """Cancel the orders among ``ids`` that are still pending; returns their ids"""
+    connection = transaction.get_connection()
+    fields = {'status': Order.Status.CANCELLED, 'updated_at': timezone.now()}
+    if connection.vendor not in RETURNING_VENDORS:
+        # The batch's rows are locked (SELECT ... FOR UPDATE), so none can
+        # have moved on since they were read
+        cancelled = Order.objects.filter(pk__in=ids, status=Order.Status.PENDING).update(**fields)
+        if cancelled != len(ids):
+            raise DatabaseError(f'{len(ids) - cancelled} locked orders changed status')
+        return ids
+    opts = Order._meta
+    qn = connection.ops.quote_name
+    assignments = ', '.join(f'{qn(opts.get_field(name).column)} = %s' for name in fields)
+    params = [opts.get_field(name).get_db_prep_save(value, connection) for name, value in fields.items()]
+    sql = (
+        f'UPDATE {qn(opts.db_table)} SET {assignments} '
+        f'WHERE {qn(opts.pk.column)} IN ({", ".join(["%s"] * len(ids))}) '
+        f'AND {qn(opts.get_field("status").column)} = %s '
+        f'RETURNING {qn(opts.pk.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + list(ids) + [Order.Status.PENDING])
+        return [pk for pk, in cursor.fetchall()]
+
+
+def _cancel_batch(orders, last_pk, batch_size):
+    """Cancel the next batch of ``orders`` after ``last_pk``; returns ``(ids, cancelled)``"""
+    with transaction.atomic():
+        batch = orders.filter(pk__gt=last_pk).order_by('pk')
+        if transaction.get_connection().features.has_select_for_update:
+            # Keep the confirmation jobs off these orders until they commit
+            batch = batch.select_for_update()
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return ids, 0
+        # Only the orders this update cancelled are restocked, whatever
+        # happened to the others since they were read
+        cancelled = _cancel_pending(ids)
+        if cancelled:
+            quantities = dict(
+                OrderItem.objects.filter(order_id__in=cancelled).order_by()
+                .values_list('product_id').annotate(quantity=Sum('quantity'))
+            )
+            release_stock(quantities)
+    return ids, len(cancelled)
+
+
+def cancel_orders(orders, batch_size=200):
+    """
+    Cancel the pending orders among queryset ``orders`` and restock their items.
+
+    Works through them in batches of ``batch_size``, one transaction each,
+    so cancelling thousands of orders never holds the write lock for long.
+    A batch runs a fixed number of queries however many orders and items
+    it holds: the batch's ids, one status update returning the ids it
+    cancelled, one sum of their item quantities per product and one stock
+    update for all of those products (see ``release_stock``). Returns how
+    many orders were cancelled.
+    """
+    orders = orders.filter(status=Order.Status.PENDING)
+    cancelled = 0
+    last_pk = 0
+    while True:
+        ids, count = _cancel_batch(orders, last_pk, batch_size)
+        if not ids:
+            return cancelled
+        cancelled += count
+        last_pk = ids[-1]
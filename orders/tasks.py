@@ -0,0 +1,32 @@
+"""
+Order post-processing, run by the job queue rather than the request.
+
+Checkout queues ``orders.confirm``; confirming an order queues
+``orders.process``. Each step is a conditional update, so a retried job,
+or an order cancelled meanwhile, is left alone.
+"""
+from django.utils import timezone
+from jobs.queue import enqueue, handler
+from .models import Order
+
+
+def advance(order_id, from_status, to_status):
+    return Order.objects.filter(pk=order_id, status=from_status).update(
+        status=to_status, updated_at=timezone.now()
+    )
+
+
+def queue_confirmation(order):
+    enqueue('orders.confirm', {'order_id': order.pk}, key=f'order:{order.pk}:confirm')
+
+
+@handler('orders.confirm')
+def confirm_order(order_id):
+    # Confirmation emails, stock alerts and the like are queued from here
+    if advance(order_id, Order.Status.PENDING, Order.Status.CONFIRMED):
+        enqueue('orders.process', {'order_id': order_id}, key=f'order:{order_id}:process')
+
+
+@handler('orders.process')
+def process_order(order_id):
+    advance(order_id, Order.Status.CONFIRMED, Order.Status.PROCESSING)
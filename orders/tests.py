@@ -1,3 +1,344 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from cart.models import Cart
+from core.middleware import QueryBudgetExceeded
+from core.testing import QueryBudgetTestMixin
+from jobs.models import Job
+from jobs.queue import drain
+from products.models import Product
+from users.models import User
+from .export import export_queryset, order_batches
+from .models import Order, OrderItem
+from .serializers import OrderProjection, OrderSerializer
+from .services import _cancel_pending as cancel_pending, cancel_orders
+from .views import OrderDetailView, OrderExportView, OrderListView
 
-# Create your tests here.
+
+class OrderCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('order-create')
+
+    def fill_cart(self, lines, stock=10, quantity=2):
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='', price=Decimal('9.99'), stock=stock)
+            for i in range(lines)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=self.user, product=product, quantity=quantity) for product in products
+        ])
+        return products
+
+    def checkout_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'shipping_address': 'Dhaka'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_checkout_creates_order_and_decrements_stock(self):
+        products = self.fill_cart(3)
+        response = self.client.post(self.url, {'shipping_address': 'Dhaka'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['items']), 3)
+        self.assertEqual(response.data['total_amount'], '59.94')
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 8)
+
+    def test_query_count_is_constant(self):
+        self.fill_cart(1)
+        small = self.checkout_queries()
+        self.fill_cart(50)
+        large = self.checkout_queries()
+        self.assertEqual(small, large)
+
+    def test_checkout_queues_status_transitions(self):
+        self.fill_cart(1)
+        response = self.client.post(self.url, {'shipping_address': 'Dhaka'})
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.status, Order.Status.PENDING)
+        self.assertEqual(drain(), 2)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PROCESSING)
+
+    def test_cancelled_orders_are_not_confirmed(self):
+        self.fill_cart(1)
+        response = self.client.post(self.url, {'shipping_address': 'Dhaka'})
+        Order.objects.filter(pk=response.data['id']).update(status=Order.Status.CANCELLED)
+        drain()
+        self.assertEqual(Order.objects.get(pk=response.data['id']).status, Order.Status.CANCELLED)
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 1)
+
+    def test_empty_cart(self):
+        response = self.client.post(self.url, {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Cart is empty')
+
+    def test_insufficient_stock_rolls_back(self):
+        products = self.fill_cart(2, stock=5, quantity=3)
+        Product.objects.filter(pk=products[1].pk).update(stock=1)
+        response = self.client.post(self.url, {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['insufficient_items'], [{
+            'product_name': products[1].name,
+            'requested_quantity': 3,
+            'available_stock': 1
+        }])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+
+class OrderListPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        for _ in range(25):
+            Order.objects.create(user=self.user, total_amount=Decimal('1.00'))
+        self.url = reverse('order-list')
+
+    def test_keyset_pages_cover_every_order_once(self):
+        seen = []
+        url = self.url + '?pagination=keyset&page_size=10'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+            self.assertNotIn('count', response.data)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_keyset_total_on_request(self):
+        response = self.client.get(self.url, {'pagination': 'keyset', 'include_total': 'true'})
+        self.assertEqual(response.data['count'], 25)
+
+    def test_page_size_is_capped(self):
+        Order.objects.bulk_create([
+            Order(user=self.user, total_amount=Decimal('1.00'), order_number=f'BULK{i}')
+            for i in range(100)
+        ])
+        response = self.client.get(self.url, {'pagination': 'keyset', 'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_page_number_remains_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class OrderQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        products = [
+            Product.objects.create(name=f'P{i}', description='', price=Decimal('2.00'), stock=10)
+            for i in range(3)
+        ]
+        for _ in range(10):
+            order = Order.objects.create(user=self.user, total_amount=Decimal('6.00'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price, subtotal=product.price)
+                for product in products
+            ])
+        self.order = order
+
+    def test_list_within_budget(self):
+        with self.assertWithinQueryBudget(OrderListView):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+
+    def test_projection_matches_serializer_output(self):
+        Order.objects.create(user=self.user, total_amount=Decimal('0'), status=Order.Status.CANCELLED)
+        request = APIRequestFactory().get('/api/orders/')
+        queryset = Order.objects.filter(user=self.user).prefetch_related('items__product').order_by('-created_at', '-id')
+        expected = OrderSerializer(queryset, many=True, context={'request': request}).data
+        projection = OrderProjection(request)
+        actual = projection.render(projection.project(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_detail_within_budget(self):
+        with self.assertWithinQueryBudget(OrderDetailView):
+            self.client.get(reverse('order-detail', args=[self.order.pk]))
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True)
+    def test_middleware_rejects_over_budget_requests(self):
+        self.client.get(reverse('order-list'))
+        with mock.patch.object(OrderListView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('order-list'))
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='pass12345')
+        self.customer = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        self.product = Product.objects.create(name='Lamp, "desk"', description='', price=Decimal('2.50'), stock=10)
+        for i in range(7):
+            order = Order.objects.create(
+                user=self.customer, total_amount=Decimal('5.00'),
+                status=Order.Status.DELIVERED if i % 2 else Order.Status.PENDING,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=self.product, quantity=1, price=Decimal('2.50'),
+                          subtotal=Decimal('2.50'))
+                for _ in range(2)
+            ])
+        Order.objects.create(user=self.customer, total_amount=Decimal('0'))
+        self.url = reverse('order-export')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_line_per_item(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 7 * 2 + 1)
+        self.assertEqual(rows[0]['product_name'], 'Lamp, "desk"')
+        self.assertEqual(rows[0]['price'], '2.50')
+        self.assertEqual(rows[-1]['item_id'], '')
+        self.assertEqual(rows[0]['user_email'], 'customer@example.com')
+
+    def test_ndjson_nests_items_and_follows_keyset_batches(self):
+        with mock.patch.object(OrderExportView, 'batch_size', 3):
+            _, body = self.export(format='ndjson')
+        orders = [json.loads(line) for line in body.splitlines()]
+        expected = list(Order.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual([order['id'] for order in orders], expected)
+        self.assertEqual(len(orders[0]['items']), 2)
+        self.assertEqual(orders[0]['total_amount'], '5.00')
+
+    def test_filters(self):
+        _, body = self.export(format='ndjson', status='delivered')
+        self.assertEqual(len(body.splitlines()), 3)
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        _, body = self.export(format='ndjson', created_after=tomorrow)
+        self.assertEqual(body, '')
+        response = self.client.get(self.url, {'status': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batches_use_constant_queries(self):
+        queryset = export_queryset()
+        with CaptureQueriesContext(connection) as ctx:
+            batches = list(order_batches(queryset, batch_size=3))
+        self.assertEqual(len(batches), 3)
+        # orders and items per batch
+        self.assertEqual(len(ctx.captured_queries), 2 * 3)
+        self.assertFalse(any('OFFSET' in q['sql'] for q in ctx.captured_queries))
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command('export_orders', '--format=csv', '--status=pending', '--batch-size=2', stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len({row['order_id'] for row in rows}), 5)
+
+
+class OrderCancelTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.customer)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description='', price=Decimal('1.00'), stock=0) for i in range(20)
+        ])
+
+    def place(self, lines=2, quantity=1, **fields):
+        order = Order.objects.create(user=self.customer, total_amount=Decimal('1.00'), **fields)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price,
+                      subtotal=product.price * quantity)
+            for product in self.products[:lines]
+        ])
+        return order
+
+    def stock(self):
+        return list(Product.objects.order_by('pk').values_list('stock', flat=True))
+
+    def cancel(self, order):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(reverse('order-cancel', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+
+    def test_cancel_restocks_in_constant_queries(self):
+        response, small = self.cancel(self.place(lines=1, quantity=3))
+        self.assertEqual(response.data['status'], Order.Status.CANCELLED)
+        self.assertEqual(self.stock()[0], 3)
+        _, large = self.cancel(self.place(lines=20))
+        self.assertEqual(small, large)
+        self.assertEqual(self.stock(), [4] + [1] * 19)
+
+    def test_only_pending_orders_are_cancelled(self):
+        order = self.place(status=Order.Status.CONFIRMED)
+        response = self.client.patch(reverse('order-cancel', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        with mock.patch('orders.views.cancel_orders', return_value=0):
+            response = self.client.patch(reverse('order-cancel', args=[self.place().pk]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(sum(self.stock()), 0)
+
+    def test_cancel_orders_in_batches(self):
+        for _ in range(7):
+            self.place(lines=3, quantity=2)
+        confirmed = self.place(lines=3, status=Order.Status.CONFIRMED)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(cancel_orders(Order.objects.all(), batch_size=3), 7)
+        # Three batches of at most 3 orders, one stock update each
+        restocks = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "products_product"')]
+        self.assertEqual(len(restocks), 3)
+        self.assertEqual(self.stock()[:4], [14, 14, 14, 0])
+        self.assertEqual(Order.objects.filter(status=Order.Status.CANCELLED).count(), 7)
+        confirmed.refresh_from_db()
+        self.assertEqual(confirmed.status, Order.Status.CONFIRMED)
+
+    def test_orders_that_moved_on_are_not_restocked(self):
+        pending = self.place(lines=2)
+        confirmed = self.place(lines=3, quantity=5)
+
+        def confirm_first(ids):
+            # The job queue confirms an order after the batch read it
+            Order.objects.filter(pk=confirmed.pk).update(status=Order.Status.CONFIRMED)
+            return cancel_pending(ids)
+
+        with mock.patch('orders.services._cancel_pending', confirm_first):
+            self.assertEqual(cancel_orders(Order.objects.all()), 1)
+        self.assertEqual(self.stock()[:3], [1, 1, 0])
+        self.assertEqual(list(Order.objects.filter(status=Order.Status.CANCELLED)), [pending])
+
+    def test_bulk_cancel_api(self):
+        card = [self.place(payment_method='card') for _ in range(3)]
+        cod = self.place(payment_method='COD')
+        url = reverse('order-bulk-cancel')
+        self.assertEqual(self.client.post(url, {'payment_method': 'card'}, format='json').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(User.objects.create_superuser(email='admin@example.com', password='pass12345'))
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'payment_method': 'card', 'order_ids': [o.pk for o in card[:2]] + [cod.pk]},
+                                    format='json')
+        self.assertEqual(response.data, {'cancelled': 2})
+        self.assertEqual(self.stock()[:2], [2, 2])
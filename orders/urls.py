@@ -1,9 +1,15 @@
 from django.urls import path
-from .views import OrderListView, OrderCreateView, OrderDetailView, OrderCancelView
+from core.asyncviews import select_view
+from .views import (
+    AsyncOrderDetailView, AsyncOrderListView, OrderListView, OrderCreateView, OrderDetailView, OrderCancelView,
+    OrderBulkCancelView, OrderExportView,
+)
 
 urlpatterns = [
-    path('', OrderListView.as_view(), name='order-list'),
+    path('', select_view('order-list', OrderListView, AsyncOrderListView), name='order-list'),
     path('create/', OrderCreateView.as_view(), name='order-create'),
-    path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('export/', OrderExportView.as_view(), name='order-export'),
+    path('cancel/', OrderBulkCancelView.as_view(), name='order-bulk-cancel'),
+    path('<int:pk>/', select_view('order-detail', OrderDetailView, AsyncOrderDetailView), name='order-detail'),
     path('<int:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
-]
\ No newline at end of file
+]
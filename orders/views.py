@@ -1,117 +1,84 @@
-from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
 from rest_framework import generics, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from cart.models import Cart
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, CreateOrderSerializer
-from users.permissions import IsCustomer
+from core.asyncviews import AsyncDetailView, AsyncListView
+from core.idempotency import IdempotentMixin
+from core.instrumentation import SerializerTimingMixin, span
+from core.pagination import OptInKeysetPagination
+from core.projections import ProjectionListMixin
+from .export import FORMATS, aiterate, export_queryset
+from .models import Order
+from .serializers import (
+    OrderBulkCancelSerializer, OrderExportSerializer, OrderProjection, OrderSerializer, CreateOrderSerializer
+)
+from .services import cancel_orders, checkout, EmptyCart, InsufficientStock
+from users.permissions import IsAdmin, IsCustomer
 
-class OrderListView(generics.ListAPIView):
+class OrderListView(SerializerTimingMixin, ProjectionListMixin, generics.ListAPIView):
     """List user's orders"""
     serializer_class = OrderSerializer
+    projection_class = OrderProjection
+    pagination_class = OptInKeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    # auth, count, orders, items joined with products
+    query_budget = 4
+    read_database = True
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return (
+            Order.objects.filter(user=self.request.user)
+            .prefetch_related('items__product')
+            .order_by('-created_at', '-id')
+        )
 
-class OrderCreateView(APIView):
+class OrderCreateView(IdempotentMixin, APIView):
     """Create a new order from cart"""
     permission_classes = [IsCustomer]
     
-    @transaction.atomic
     def post(self, request):
         serializer = CreateOrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        user = request.user
-        cart_items = Cart.objects.filter(user=user)
-        
-        if not cart_items.exists():
+        try:
+            order = checkout(
+                request.user,
+                shipping_address=serializer.validated_data.get('shipping_address', ''),
+                payment_method=serializer.validated_data.get('payment_method', 'COD')
+            )
+        except EmptyCart:
             return Response(
                 {'error': 'Cart is empty'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Collect all products with insufficient stock
-        insufficient_stock_items = []
-        
-        for cart_item in cart_items:
-            product = cart_item.product
-            quantity = cart_item.quantity
-            
-            # Check if stock is available
-            if not product.is_available(quantity):
-                insufficient_stock_items.append({
-                    'product_name': product.name,
-                    'requested_quantity': quantity,
-                    'available_stock': product.stock
-                })
-        
-        # If any product has insufficient stock, return error with details
-        if insufficient_stock_items:
+        except InsufficientStock as exc:
             return Response(
                 {
                     'error': 'Insufficient stock for some items',
-                    'insufficient_items': insufficient_stock_items,
+                    'insufficient_items': exc.items,
                     'message': 'Please update your cart quantities or remove unavailable items'
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Calculate total if all items are available
-        total_amount = 0
-        order_items_data = []
-        
-        for cart_item in cart_items:
-            product = cart_item.product
-            quantity = cart_item.quantity
-            
-            item_total = product.price * quantity
-            total_amount += item_total
-            
-            order_items_data.append({
-                'product': product,
-                'quantity': quantity,
-                'price': product.price
-            })
-        
-        # Create order
-        order = Order.objects.create(
-            user=user,
-            total_amount=total_amount,
-            shipping_address=serializer.validated_data.get('shipping_address', ''),
-            payment_method=serializer.validated_data.get('payment_method', 'COD')
-        )
-        
-        # Create order items and update stock
-        for item_data in order_items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            # Reduce product stock
-            product.reduce_stock(quantity)
-            
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=item_data['price']
-            )
-        
-        # Clear cart
-        cart_items.delete()
-        
-        return Response(
-            OrderSerializer(order).data,
-            status=status.HTTP_201_CREATED
-        )
+        prefetch_related_objects([order], 'items__product')
+        with span('serialize'):
+            data = OrderSerializer(order).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SerializerTimingMixin, generics.RetrieveAPIView):
     """Retrieve order details"""
     serializer_class = OrderSerializer
+    # auth, order, items, products
+    query_budget = 4
+    read_database = True
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.filter(user=self.request.user).prefetch_related('items__product')
 
 class OrderCancelView(generics.UpdateAPIView):
     """Cancel an order (only if pending)"""
@@ -122,15 +89,80 @@ class OrderCancelView(generics.UpdateAPIView):
     
     def update(self, request, *args, **kwargs):
         order = self.get_object()
-        
-        # Restock items
-        for item in order.items.all():
-            item.product.increase_stock(item.quantity)
-        
-        order.status = 'cancelled'
-        order.save()
-        
-        return Response(
-            OrderSerializer(order).data,
-            status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        if not cancel_orders(Order.objects.filter(pk=order.pk)):
+            # Confirmed by the job queue since it was read
+            return Response(
+                {'error': 'Order can no longer be cancelled'},
+                status=status.HTTP_409_CONFLICT
+            )
+        order.status = Order.Status.CANCELLED
+        prefetch_related_objects([order], 'items__product')
+        with span('serialize'):
+            data = OrderSerializer(order).data
+        return Response(data, status=status.HTTP_200_OK)
+
+class OrderBulkCancelView(APIView):
+    """Cancel many pending orders at once, e.g. after a payment provider outage"""
+    permission_classes = [IsAdmin]
+
+    def post(self, request):
+        serializer = OrderBulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        orders = Order.objects.all()
+        if 'order_ids' in params:
+            orders = orders.filter(pk__in=params['order_ids'])
+        if params.get('payment_method'):
+            orders = orders.filter(payment_method=params['payment_method'])
+        if params.get('created_after'):
+            orders = orders.filter(created_at__gte=params['created_after'])
+        if params.get('created_before'):
+            orders = orders.filter(created_at__lt=params['created_before'])
+        return Response({'cancelled': cancel_orders(orders)}, status=status.HTTP_200_OK)
+
+class ExportNegotiation(DefaultContentNegotiation):
+    """``?format=`` picks the export format, not a renderer; errors are JSON"""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+class OrderExportView(APIView):
+    """Stream all orders with their items as CSV or NDJSON"""
+    permission_classes = [IsAdmin]
+    renderer_classes = [JSONRenderer]
+    content_negotiation_class = ExportNegotiation
+    batch_size = 1000
+
+    def get(self, request):
+        serializer = OrderExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+        chunks, content_type, extension = FORMATS[filters.pop('format')]
+        content = chunks(export_queryset(**filters), self.batch_size)
+        if isinstance(request._request, ASGIRequest):
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="orders.{extension}"'
+        return response
+
+class AsyncOrderListView(AsyncListView):
+    """Async GET for ``OrderListView``"""
+    sync_view_class = OrderListView
+    projection_class = OrderProjection
+    # auth, count, orders, items joined with products
+    query_budget = 4
+    read_database = True
+
+    def get_queryset(self, request):
+        return Order.objects.filter(user=request.user).order_by('-created_at', '-id')
+
+class AsyncOrderDetailView(AsyncDetailView):
+    """Async GET for ``OrderDetailView``"""
+    sync_view_class = OrderDetailView
+    projection_class = OrderProjection
+    # auth, order, items joined with products
+    query_budget = {'GET': 3}
+    read_database = True
+
+    def get_queryset(self, request):
+        return Order.objects.filter(user=request.user)
@@ -1,9 +1,19 @@
 from django.contrib import admin
 from .models import Product
+from .search import search
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock', 'created_at')
+    list_display = ('name', 'sku', 'price', 'stock', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('name', 'description')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    search_fields = ('name', 'sku', 'description')
+    readonly_fields = ('created_at', 'updated_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index instead of LIKE '%term%' scans; an exact SKU wins
+        if not search_term:
+            return queryset, False
+        by_sku = queryset.filter(sku=search_term)
+        if by_sku.exists():
+            return by_sku, False
+        return search(queryset, search_term), False
\ No newline at end of file
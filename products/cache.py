@@ -0,0 +1,142 @@
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from core.db.routers import reads_may_lag
+
+LIST_VERSION_KEY = 'catalog:version:list'
+PRODUCT_VERSION_KEY = 'catalog:version:product:{}'
+
+
+def _timeout():
+    timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+    if reads_may_lag():
+        timeout = min(timeout, getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5))
+    return timeout
+
+
+def _source():
+    # A lagging replica can re-cache rows an invalidation just evicted: its
+    # pages are kept apart, and briefly, so users reading their own writes
+    # from default never see them
+    return ':replica' if reads_may_lag() else ''
+
+
+def _version(key):
+    # Versions are random tokens rather than counters so an evicted version
+    # key can never come back with a value that matches stale entries.
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(product_ids):
+    cache.set_many(
+        {key: uuid.uuid4().hex for key in
+         [LIST_VERSION_KEY] + [PRODUCT_VERSION_KEY.format(pk) for pk in product_ids]},
+        None
+    )
+
+
+def invalidate_products(product_ids=()):
+    """
+    Invalidate cached catalog pages and the details of ``product_ids``.
+
+    Deferred until the current transaction commits, so a rolled back
+    checkout doesn't evict anything and readers never re-cache rows that
+    are about to change.
+    """
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: _bump(product_ids))
+
+
+def _url_hash(request):
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def list_cache_key(request):
+    return 'catalog:list:{}:{}{}'.format(_version(LIST_VERSION_KEY), _url_hash(request), _source())
+
+
+def detail_cache_key(request, pk):
+    return 'catalog:product:{}:{}:{}{}'.format(
+        pk, _version(PRODUCT_VERSION_KEY.format(pk)), _url_hash(request), _source()
+    )
+
+
+async def alist_cache_key(request):
+    return 'catalog:list:{}:{}{}'.format(await _aversion(LIST_VERSION_KEY), _url_hash(request), _source())
+
+
+async def adetail_cache_key(request, pk):
+    return 'catalog:product:{}:{}:{}{}'.format(
+        pk, await _aversion(PRODUCT_VERSION_KEY.format(pk)), _url_hash(request), _source()
+    )
+
+
+def make_etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return quote_etag(hashlib.md5(payload).hexdigest())
+
+
+def cached_response(request, key, build):
+    """
+    Serve ``build()``'s response through the cache under ``key``.
+
+    Only successful responses are cached. Clients sending a matching
+    ``If-None-Match`` get an empty 304 without any serialization.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = {'data': response.data, 'etag': make_etag(response.data)}
+        cache.set(key, entry, _timeout())
+
+    return _conditional_response(request, entry, Response)
+
+
+async def acached_response(request, key, build, response_class):
+    """
+    ``cached_response`` for async views.
+
+    ``build`` is awaited for the response data and raises on errors, which
+    are never cached; responses are built with ``response_class(data,
+    status=...)``.
+    """
+    entry = await cache.aget(key)
+    if entry is None:
+        data = await build()
+        entry = {'data': data, 'etag': make_etag(data)}
+        await cache.aset(key, entry, _timeout())
+    return _conditional_response(request, entry, response_class)
+
+
+def _conditional_response(request, entry, response_class):
+    etags = [
+        etag[2:] if etag.startswith('W/') else etag
+        for etag in parse_etags(request.headers.get('If-None-Match', ''))
+    ]
+    if entry['etag'] in etags or '*' in etags:
+        response = response_class(None, status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = response_class(entry['data'])
+    response['ETag'] = entry['etag']
+    return response
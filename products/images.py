@@ -0,0 +1,150 @@
+"""
+Resized derivatives of product images.
+
+When a product image is uploaded, copies of it in each width of
+``PRODUCT_IMAGE_WIDTHS`` (never upscaled) and each format of
+``PRODUCT_IMAGE_FORMATS`` are generated on a background thread pool after
+the transaction commits, so the upload request doesn't wait for Pillow.
+Derivatives are stored by the SHA-256 of the original's bytes: a re-upload
+of the same picture reuses the files already on disk. Once they exist the
+product records the hash and widths and the API serves them as
+``image_srcset``.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+from .cache import invalidate_products
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'products/derivatives'
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+# EXIF orientations that swap width and height
+TRANSPOSED = {5, 6, 7, 8}
+
+
+def widths():
+    return getattr(settings, 'PRODUCT_IMAGE_WIDTHS', [160, 320, 640, 1280])
+
+
+def formats():
+    return getattr(settings, 'PRODUCT_IMAGE_FORMATS', ['webp', 'jpeg'])
+
+
+def storage():
+    return Product._meta.get_field('image').storage
+
+
+def derivative_name(digest, width, fmt):
+    return f'{DERIVATIVES_DIR}/{digest[:2]}/{digest}/{width}.{fmt}'
+
+
+def derivative_widths(original_width):
+    """Configured widths, with those wider than the original replaced by its own width"""
+    return sorted({min(width, original_width) for width in widths()})
+
+
+def _encode(image, width, fmt):
+    if width < image.width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, PIL_FORMATS[fmt], quality=getattr(settings, 'PRODUCT_IMAGE_QUALITY', 80))
+    return buffer.getvalue()
+
+
+def render_derivatives(data, digest):
+    """Write the derivatives of image bytes ``data`` that aren't stored yet; returns their widths"""
+    image = Image.open(io.BytesIO(data))
+    orientation = image.getexif().get(0x0112)
+    original_width = image.height if orientation in TRANSPOSED else image.width
+    sizes = derivative_widths(original_width)
+    missing = [(width, fmt) for width in sizes for fmt in formats()
+               if not storage().exists(derivative_name(digest, width, fmt))]
+    if missing:
+        image = ImageOps.exif_transpose(image)
+        for width, fmt in missing:
+            storage().save(derivative_name(digest, width, fmt), ContentFile(_encode(image, width, fmt)))
+    return sizes
+
+
+def generate(product_id):
+    """Make sure the derivatives of a product's current image exist and are recorded"""
+    name = Product.objects.filter(pk=product_id).values_list('image', flat=True).first()
+    if not name:
+        return None
+    with storage().open(name, 'rb') as original:
+        data = original.read()
+    digest = hashlib.sha256(data).hexdigest()
+    sizes = render_derivatives(data, digest)
+    # Skipped if another upload replaced the image meanwhile; its own job records it
+    if Product.objects.filter(pk=product_id, image=name).update(image_hash=digest, image_widths=sizes):
+        invalidate_products([product_id])
+    return digest
+
+
+class ImagePool:
+    """Runs ``generate`` off the request thread; ``PRODUCT_IMAGE_WORKERS = 0`` runs it inline"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def schedule(self, product_id):
+        workers = getattr(settings, 'PRODUCT_IMAGE_WORKERS', 1)
+        if not workers:
+            self.run(product_id)
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+        self.executor.submit(self.work, product_id)
+
+    def run(self, product_id):
+        try:
+            generate(product_id)
+        except Exception:
+            logger.exception('Could not generate image derivatives for product %s', product_id)
+
+    def work(self, product_id):
+        try:
+            self.run(product_id)
+        finally:
+            connection.close()
+
+
+pool = ImagePool()
+
+
+def srcset_renderer(request=None):
+    """Render ``(image_hash, image_widths)`` as ``{format: 'url 160w, url 320w'}``, or ``None``"""
+    files = storage()
+
+    def render(digest, sizes):
+        if not digest or not sizes:
+            return None
+        srcset = {}
+        for fmt in formats():
+            entries = []
+            for width in sizes:
+                url = files.url(derivative_name(digest, width, fmt))
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                entries.append(f'{url} {width}w')
+            srcset[fmt] = ', '.join(entries)
+        return srcset
+
+    return render
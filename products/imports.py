@@ -0,0 +1,155 @@
+"""
+Bulk product import keyed by SKU.
+
+Rows stream in from CSV or NDJSON and are handled a batch at a time: each
+row is validated on its own, so a bad row is reported without failing its
+neighbours; the batch's existing products are read in one query; new SKUs
+are inserted with one ``bulk_create(update_conflicts=True)`` and changed
+ones written with ``bulk_update``. Rows that change nothing are skipped,
+and only products that actually changed are evicted from the catalog
+cache. Bulk writes send no ``post_save``, so the cart summaries holding
+re-priced products are refreshed here.
+"""
+import csv
+import itertools
+import json
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from cart.models import CartSummary
+from .cache import invalidate_products
+from .models import Product
+
+FIELDS = ['name', 'description', 'price', 'stock']
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """One feed row; fields left out keep their current value"""
+    sku = serializers.CharField(max_length=64)
+    name = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = serializers.IntegerField(min_value=0, max_value=2147483647, required=False)
+
+
+def read_csv(lines):
+    """Yield ``(line, row)`` from CSV text lines with a header; empty cells are left out"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def read_ndjson(lines):
+    """Yield ``(line, row)`` from NDJSON text lines; unparsable lines yield the error as the row"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = serializers.ValidationError(f'Invalid JSON: {exc}')
+        yield number, row
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.created = self.updated = self.unchanged = self.failed = 0
+        self.errors = []
+
+    def fail(self, line, sku, detail):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'sku': sku, 'errors': detail})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def import_products(rows, batch_size=1000, max_errors=1000):
+    """
+    Upsert ``(line, row)`` pairs from ``READERS``; returns the counts and
+    the first ``max_errors`` row errors.
+
+    Each batch commits on its own, so an interrupted import keeps the
+    batches already written and can simply be run again.
+    """
+    result = ImportResult(max_errors)
+    serializer = ProductImportSerializer()
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return result
+        valid = {}
+        for line, row in batch:
+            sku = row.get('sku') if isinstance(row, dict) else None
+            try:
+                if isinstance(row, serializers.ValidationError):
+                    raise row
+                data = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                result.fail(line, sku, exc.detail)
+                continue
+            # Later rows for the same SKU win, field by field
+            valid.setdefault(data['sku'], {'line': line}).update(data)
+        _write_batch(valid, result)
+
+
+def _write_batch(rows, result):
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            product.sku: product
+            for product in Product.objects.filter(sku__in=list(rows)).only('id', 'sku', *FIELDS)
+        }
+        created, changed = [], {}
+        for sku, row in rows.items():
+            product = existing.get(sku)
+            if product is None:
+                missing = [field for field in ('name', 'price') if field not in row]
+                if missing:
+                    result.fail(row['line'], sku, {
+                        field: ['This field is required for new products.'] for field in missing
+                    })
+                    continue
+                created.append(Product(
+                    sku=sku, name=row['name'], description=row.get('description', ''),
+                    price=row['price'], stock=row.get('stock', 0), created_at=now, updated_at=now,
+                ))
+                continue
+            fields = tuple(field for field in FIELDS if field in row and row[field] != getattr(product, field))
+            if not fields:
+                result.unchanged += 1
+                continue
+            for field in fields:
+                setattr(product, field, row[field])
+            product.updated_at = now
+            changed.setdefault(fields, []).append(product)
+
+        if created:
+            # A SKU inserted concurrently since the read above is updated instead
+            Product.objects.bulk_create(
+                created, update_conflicts=True, unique_fields=['sku'], update_fields=FIELDS + ['updated_at']
+            )
+        for fields, products in changed.items():
+            Product.objects.bulk_update(products, list(fields) + ['updated_at'])
+
+        updated_ids = [product.pk for products in changed.values() for product in products]
+        if created or updated_ids:
+            # New products only show up on list pages; their details were never cached
+            invalidate_products(updated_ids)
+        CartSummary.objects.refresh_for_products([
+            product.pk for fields, products in changed.items() if 'price' in fields for product in products
+        ])
+    result.created += len(created)
+    result.updated += len(updated_ids)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from products.images import generate
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generate resized derivatives for product images that have none (or all with --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Check every image, e.g. after changing PRODUCT_IMAGE_WIDTHS; existing files are reused')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(image_hash='')
+        done = failed = 0
+        last = 0
+        while True:
+            ids = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            for product_id in ids:
+                try:
+                    generate(product_id)
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'Product {product_id}: {exc}')
+            last = ids[-1]
+        self.stdout.write(f'Generated derivatives for {done} products, {failed} failed')
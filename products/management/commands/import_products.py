@@ -0,0 +1,34 @@
+import codecs
+import sys
+from django.core.management.base import BaseCommand
+from products.imports import import_products, READERS
+
+
+class Command(BaseCommand):
+    help = 'Create or update products by SKU from a CSV or NDJSON feed, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin")
+        parser.add_argument('--format', choices=sorted(READERS), default=None,
+                            help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-errors', type=int, default=100, help='Row errors to print')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if path == '-':
+            result = self.load(sys.stdin.buffer, fmt, options)
+        else:
+            with open(path, 'rb') as feed:
+                result = self.load(feed, fmt, options)
+
+        for error in result.errors:
+            self.stderr.write(f'line {error["line"]} ({error["sku"]}): {error["errors"]}')
+        self.stdout.write(f'Created {result.created}, updated {result.updated}, '
+                          f'unchanged {result.unchanged}, failed {result.failed}')
+
+    def load(self, feed, fmt, options):
+        lines = codecs.iterdecode(feed, 'utf-8-sig', errors='replace')
+        return import_products(READERS[fmt](lines), batch_size=options['batch_size'],
+                               max_errors=options['max_errors'])
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:36
+
+from importlib import import_module
+from django.db import migrations, models
+
+search = import_module('products.migrations.0004_product_search')
+
+# Adding (or removing) the columns remakes products_product on SQLite, which
+# drops the search triggers; the row ids, and so the index, are unchanged
+restore_search_triggers = search.run({'sqlite': search.SQLITE_DROP_TRIGGERS + search.SQLITE_TRIGGERS})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_widths',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
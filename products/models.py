@@ -1,14 +1,27 @@
 from django.db import models
+from django.db.models import F
+from .cache import invalidate_products
 
 class Product(models.Model):
+    # Key of the product in external feeds; see products.imports
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Recorded by products.images once resized copies of ``image`` exist
+    image_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    image_widths = models.JSONField(default=list, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Admin date filter
+            models.Index(fields=['-created_at'], name='product_created_idx'),
+        ]
+    
     def __str__(self):
         return self.name
     
@@ -16,12 +29,15 @@ class Product(models.Model):
         return self.stock >= quantity
     
     def reduce_stock(self, quantity):
-        if self.is_available(quantity):
-            self.stock -= quantity
-            self.save()
-            return True
-        return False
+        updated = Product.objects.filter(pk=self.pk, stock__gte=quantity).update(
+            stock=F('stock') - quantity
+        )
+        if updated:
+            invalidate_products([self.pk])
+        self.refresh_from_db(fields=['stock'])
+        return bool(updated)
     
     def increase_stock(self, quantity):
-        self.stock += quantity
-        self.save()
\ No newline at end of file
+        Product.objects.filter(pk=self.pk).update(stock=F('stock') + quantity)
+        invalidate_products([self.pk])
+        self.refresh_from_db(fields=['stock'])
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Full-text product search.
+
+On SQLite products are indexed in an FTS5 table (``products_product_fts``)
+that triggers keep in sync, so bulk writes that skip signals are indexed
+too; see migration 0004. Searches join it to the product table in one
+query: FTS5 finds and ranks (bm25) the matches, price and stock filters
+apply to the same rows. SQLite drops the triggers whenever a migration
+remakes the product table; such migrations recreate them, as 0005 does.
+PostgreSQL uses a GIN expression index over a ``tsvector`` instead; other
+backends fall back to ``icontains``.
+
+Every word of the query must match, as a prefix: ``lam des`` finds "Desk
+lamp".
+"""
+import re
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = 'products_product_fts'
+# Matching PostgreSQL expression index (migration 0004)
+TSVECTOR_SQL = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+WORD = re.compile(r'\w+')
+
+
+def terms(query):
+    return WORD.findall(query)[:16]
+
+
+def fts_query(query):
+    """FTS5 MATCH expression: every word as a quoted prefix, so user input can't inject operators"""
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def search(queryset, query):
+    """``queryset`` narrowed to products matching ``query``, best matches first"""
+    words = terms(query)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = products_product.id', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_query(query)],
+        ).order_by(RawSQL(f'{FTS_TABLE}.rank', ()).asc(), 'id')
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return queryset.extra(where=[f'{TSVECTOR_SQL} @@ to_tsquery(\'simple\', %s)'], params=[tsquery]).order_by(
+            RawSQL(f"ts_rank({TSVECTOR_SQL}, to_tsquery('simple', %s))", (tsquery,)).desc(), 'id'
+        )
+    condition = Q()
+    for word in words:
+        condition &= Q(name__icontains=word) | Q(description__icontains=word)
+    return queryset.filter(condition)
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    search = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    in_stock = serializers.BooleanField(required=False)
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """``?search=``, ``?min_price=``, ``?max_price=`` and ``?in_stock=true`` on product listings"""
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = ProductFilterSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        params = serializer.validated_data
+        if params.get('min_price') is not None:
+            queryset = queryset.filter(price__gte=params['min_price'])
+        if params.get('max_price') is not None:
+            queryset = queryset.filter(price__lte=params['max_price'])
+        if params.get('in_stock'):
+            queryset = queryset.filter(stock__gt=0)
+        if params.get('search'):
+            queryset = search(queryset, params['search'])
+        return queryset
@@ -1,8 +1,46 @@
 from rest_framework import serializers
+from core.projections import Projection, datetime_renderer, decimal_renderer, file_url_renderer
+from .images import srcset_renderer
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'stock', 'image', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'sku', 'name', 'description', 'price', 'stock', 'image', 'image_srcset',
+                  'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+    def get_image_srcset(self, product):
+        return srcset_renderer(self.context.get('request'))(product.image_hash, product.image_widths)
+
+
+class ProductProjection(Projection):
+    """Read-only equivalent of ``ProductSerializer``"""
+    fields = ['id', 'sku', 'name', 'description', 'price', 'stock', 'image', 'image_hash', 'image_widths',
+              'created_at', 'updated_at']
+
+    def __init__(self, request=None, prefix=''):
+        super().__init__(request)
+        self.prefix = prefix
+        self.source_fields = [prefix + field for field in self.fields]
+        self.render_price = decimal_renderer(10, 2)
+        self.render_datetime = datetime_renderer()
+        self.render_image = file_url_renderer(Product._meta.get_field('image').storage, request)
+        self.render_srcset = srcset_renderer(request)
+
+    def render_row(self, row):
+        p = self.prefix
+        return {
+            'id': row[p + 'id'],
+            'sku': row[p + 'sku'],
+            'name': row[p + 'name'],
+            'description': row[p + 'description'],
+            'price': self.render_price(row[p + 'price']),
+            'stock': row[p + 'stock'],
+            'image': self.render_image(row[p + 'image']),
+            'image_srcset': self.render_srcset(row[p + 'image_hash'], row[p + 'image_widths']),
+            'created_at': self.render_datetime(row[p + 'created_at']),
+            'updated_at': self.render_datetime(row[p + 'updated_at']),
+        }
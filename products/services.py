@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from .cache import invalidate_products
+from .models import Product
+
+
+class StockReservationError(Exception):
+    """Raised when a reservation cannot be satisfied for every product"""
+
+    def __init__(self, stock):
+        super().__init__('Insufficient stock')
+        # Current stock of every product involved, keyed by product id
+        self.stock = stock
+
+
+def _quantity_case(quantities):
+    return Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()])
+
+
+def reserve_stock(quantities):
+    """
+    Atomically take ``quantities`` ({product_id: quantity}) out of stock.
+
+    Issues ``UPDATE ... SET stock = stock - n WHERE stock >= n`` for all
+    products in one statement and compares the affected row count. If any
+    product is short the enclosing transaction is rolled back and
+    ``StockReservationError`` is raised, so callers either get every line
+    or none of them.
+    """
+    if not quantities:
+        return
+    ids = sorted(quantities)
+    try:
+        with transaction.atomic():
+            if transaction.get_connection().features.has_select_for_update:
+                # Lock rows in a stable order so overlapping reservations queue
+                # up instead of deadlocking on server databases.
+                list(Product.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk'))
+            in_stock = Q()
+            for pk in ids:
+                in_stock |= Q(pk=pk, stock__gte=quantities[pk])
+            updated = Product.objects.filter(in_stock).update(
+                stock=F('stock') - _quantity_case(quantities),
+                updated_at=timezone.now()
+            )
+            if updated != len(ids):
+                raise StockReservationError({})
+    except StockReservationError as exc:
+        # Read after the rollback so the partial decrement isn't reported
+        exc.stock = dict(Product.objects.filter(pk__in=ids).values_list('pk', 'stock'))
+        raise
+    invalidate_products(ids)
+
+
+def release_stock(quantities):
+    """Return ``quantities`` ({product_id: quantity}) to stock"""
+    if not quantities:
+        return
+    Product.objects.filter(pk__in=quantities).update(
+        stock=F('stock') + _quantity_case(quantities),
+        updated_at=timezone.now()
+    )
+    invalidate_products(quantities)
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .cache import invalidate_products
+from .images import pool
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def track_image_upload(sender, instance, **kwargs):
+    if 'image' in instance.get_deferred_fields():
+        return
+    # Uploaded files are still uncommitted here; the field saves them next
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+    if instance._image_uploaded or not instance.image:
+        instance.image_hash, instance.image_widths = '', []
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_derivatives(sender, instance, **kwargs):
+    if getattr(instance, '_image_uploaded', False):
+        product_id = instance.pk
+        transaction.on_commit(lambda: pool.schedule(product_id))
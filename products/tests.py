@@ -1,3 +1,351 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from PIL import Image as PILImage
+from rest_framework.test import APIRequestFactory, APITestCase
+from cart.models import Cart, CartSummary
+from users.models import User
+from . import images
+from .models import Product
+from .serializers import ProductProjection, ProductSerializer
+from .views import ProductImportView
+from .services import reserve_stock, release_stock, StockReservationError
 
-# Create your tests here.
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.a = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=5)
+        self.b = Product.objects.create(name='B', description='', price=Decimal('1.00'), stock=1)
+
+    def test_reserve_and_release(self):
+        reserve_stock({self.a.pk: 3, self.b.pk: 1})
+        release_stock({self.a.pk: 1})
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.stock, self.b.stock), (3, 0))
+
+    def test_shortfall_reserves_nothing(self):
+        with self.assertRaises(StockReservationError) as ctx:
+            reserve_stock({self.a.pk: 3, self.b.pk: 2})
+        self.assertEqual(ctx.exception.stock, {self.a.pk: 5, self.b.pk: 1})
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 5)
+
+    def test_reduce_stock_reports_failure(self):
+        self.assertFalse(self.b.reduce_stock(2))
+        self.assertTrue(self.b.reduce_stock(1))
+        self.assertEqual(self.b.stock, 0)
+
+
+class StockReservationConcurrencyTests(TransactionTestCase):
+    threads = 8
+    attempts_per_thread = 25
+
+    def test_concurrent_reservations_never_oversell(self):
+        products = [
+            Product.objects.create(name=f'P{i}', description='', price=Decimal('1.00'), stock=40)
+            for i in range(3)
+        ]
+        ids = [product.pk for product in products]
+        reserved = {pk: 0 for pk in ids}
+        lock = threading.Lock()
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(self.attempts_per_thread):
+                    quantities = {pk: rng.randint(1, 3) for pk in rng.sample(ids, rng.randint(1, len(ids)))}
+                    while True:
+                        try:
+                            reserve_stock(quantities)
+                        except StockReservationError:
+                            break
+                        except OperationalError:
+                            # SQLite reports lock contention instead of waiting; retry
+                            time.sleep(0.001)
+                            continue
+                        with lock:
+                            for pk, quantity in quantities.items():
+                                reserved[pk] += quantity
+                        break
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(any(reserved.values()))
+
+        for product in Product.objects.filter(pk__in=ids):
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock + reserved[product.pk], 40)
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=5)
+        self.list_url = reverse('product-list')
+        self.detail_url = reverse('product-detail', args=[self.product.pk])
+
+    def test_list_is_served_from_cache(self):
+        self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_save_invalidates_list_and_detail(self):
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+        self.product.price = Decimal('2.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get(self.list_url).data['results'][0]['price'], '2.50')
+        self.assertEqual(self.client.get(self.detail_url).data['price'], '2.50')
+
+    def test_stock_reservation_invalidates_detail(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock({self.product.pk: 2})
+        self.assertEqual(self.client.get(self.detail_url).data['stock'], 3)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProductProjectionTests(TestCase):
+    def test_matches_serializer_output(self):
+        Product.objects.create(name='Plain', description='d', price=Decimal('3.5'), stock=0)
+        Product.objects.create(name='Pic', description='', price=Decimal('1234.99'), stock=7,
+                               image='products/pic.jpg')
+        request = APIRequestFactory().get('/api/products/')
+        queryset = Product.objects.order_by('id')
+        expected = ProductSerializer(queryset, many=True, context={'request': request}).data
+        projection = ProductProjection(request)
+        actual = projection.render(projection.project(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+class ProductImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='pass12345')
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp = Product.objects.create(sku='LAMP', name='Lamp', description='', price=Decimal('5.00'), stock=3)
+            self.desk = Product.objects.create(sku='DESK', name='Desk', description='', price=Decimal('90.00'), stock=1)
+        self.url = reverse('product-import')
+
+    def post(self, body, content_type='text/csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, content_type=content_type)
+
+    def test_csv_upserts_and_reports_row_errors(self):
+        body = (
+            'sku,name,price,stock\n'
+            'LAMP,,6.50,\n'           # price change only
+            'DESK,,90.00,1\n'         # unchanged
+            'CHAIR,"Chair, oak",40,8\n'
+            'STOOL,,12,2\n'           # new without a name
+            'BAD,Bad,-1,2\n'
+        )
+        response = self.post(body)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: response.data[key] for key in ('created', 'updated', 'unchanged', 'failed')},
+            {'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 2},
+        )
+        self.assertEqual(sorted(error['line'] for error in response.data['errors']), [5, 6])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.lamp.refresh_from_db()
+        self.assertEqual((self.lamp.name, self.lamp.price, self.lamp.stock), ('Lamp', Decimal('6.50'), 3))
+        self.assertEqual(Product.objects.get(sku='CHAIR').name, 'Chair, oak')
+
+    def test_ndjson_batches_keep_queries_flat(self):
+        lines = [json.dumps({'sku': f'S{i}', 'name': f'P{i}', 'price': '1.00', 'stock': i}) for i in range(50)]
+        lines.insert(10, '{not json')
+        lines.append(json.dumps({'sku': 'LAMP', 'stock': 9}))
+        with mock.patch.object(ProductImportView, 'batch_size', 20), \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.post('\n'.join(lines), 'application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (50, 1, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 11)
+        # Per batch: savepoint, existing products, inserts/updates, release
+        self.assertLess(len(ctx.captured_queries), 3 * 6)
+        self.assertEqual(Product.objects.get(sku='LAMP').stock, 9)
+
+    def test_only_changed_products_are_invalidated(self):
+        lamp_url = reverse('product-detail', args=[self.lamp.pk])
+        desk_url = reverse('product-detail', args=[self.desk.pk])
+        self.client.get(lamp_url)
+        self.client.get(desk_url)
+        self.post('sku,stock\nLAMP,7\nDESK,1\n')
+        with self.assertNumQueries(0):
+            self.client.get(desk_url)
+        self.assertEqual(self.client.get(lamp_url).data['stock'], 7)
+
+    def test_price_changes_refresh_cart_summaries(self):
+        customer = User.objects.create_user(email='c@example.com', password='pass12345')
+        Cart.objects.add_item(customer, self.lamp, 2)
+        CartSummary.objects.refresh([customer.pk])
+        self.post('sku,price\nLAMP,99.00\n')
+        self.assertEqual(CartSummary.objects.get(user=customer).subtotal, Decimal('198.00'))
+
+    def test_admin_only_and_content_type(self):
+        response = self.client.post(self.url, 'sku\n', content_type='application/xml')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.client.force_authenticate(User.objects.create_user(email='c@example.com', password='pass12345'))
+        response = self.client.post(self.url, 'sku\n', content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as feed:
+            feed.write(json.dumps({'sku': 'LAMP', 'price': '4.00'}) + '\n')
+        self.addCleanup(os.unlink, feed.name)
+        out = io.StringIO()
+        call_command('import_products', feed.name, stdout=out)
+        self.assertIn('updated 1', out.getvalue())
+        self.assertEqual(Product.objects.get(sku='LAMP').price, Decimal('4.00'))
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user(email='c@example.com', password='pass12345'))
+        self.lamp = Product.objects.create(name='Desk lamp', description='Brass, warm light',
+                                           price=Decimal('20.00'), stock=3)
+        self.shade = Product.objects.create(name='Lamp shade', description='Fits any desk lamp',
+                                            price=Decimal('5.00'), stock=0)
+        Product.objects.create(name='Chair', description='Oak', price=Decimal('50.00'), stock=1)
+        self.url = reverse('product-list')
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['name'] for product in response.data['results']]
+
+    def test_ranked_prefix_matches(self):
+        self.assertEqual(self.names(search='lamp'), ['Lamp shade', 'Desk lamp'])
+        self.assertEqual(self.names(search='des lam'), ['Lamp shade', 'Desk lamp'])
+        self.assertEqual(self.names(search='brass'), ['Desk lamp'])
+        self.assertEqual(self.names(search='"OR (*'), [])
+
+    def test_filters_share_the_search_query(self):
+        self.assertEqual(self.names(search='lamp', in_stock='true'), ['Desk lamp'])
+        self.assertEqual(self.names(search='lamp', max_price='10'), ['Lamp shade'])
+        self.assertEqual(self.names(min_price='20', in_stock='true'), ['Desk lamp', 'Chair'])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {'search': 'lamp', 'in_stock': 'true', 'page_size': 1})
+        page = ctx.captured_queries[-1]['sql']
+        self.assertIn('MATCH', page)
+        self.assertIn('"stock" > 0', page)
+        response = self.client.get(self.url, {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_bulk_writes(self):
+        Product.objects.filter(pk=self.lamp.pk).update(name='Floor light')
+        Product.objects.filter(pk=self.shade.pk).delete()
+        Product.objects.bulk_create([Product(name='Lampion', description='', price=Decimal('1.00'))])
+        self.assertEqual(self.names(search='lamp'), ['Lampion'])
+        self.assertEqual(self.names(search='floor'), ['Floor light'])
+
+    def test_keyset_pages_of_search_results(self):
+        response = self.client.get(self.url, {'search': 'lamp', 'pagination': 'keyset'})
+        self.assertEqual([product['id'] for product in response.data['results']], [self.lamp.pk, self.shade.pk])
+
+
+def image_file(width, height, name='photo.png', color='red'):
+    buffer = io.BytesIO()
+    PILImage.new('RGBA', (width, height), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(PRODUCT_IMAGE_WORKERS=0, PRODUCT_IMAGE_WIDTHS=[100, 200, 400])
+class ProductImageTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = override_settings(MEDIA_ROOT=media.name, MEDIA_URL='/media/')
+        self.media.enable()
+        self.addCleanup(self.media.disable)
+        self.client.force_authenticate(User.objects.create_superuser(email='admin@example.com', password='pass12345'))
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('product-list'), {
+                'name': 'Lamp', 'description': 'Brass', 'price': '5.00', 'stock': 1, 'image': image,
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Product.objects.get(pk=response.data['id'])
+
+    def test_upload_generates_srcset_without_upscaling(self):
+        product = self.create(image_file(300, 150))
+        self.assertEqual(product.image_widths, [100, 200, 300])
+        srcset = self.client.get(reverse('product-detail', args=[product.pk])).data['image_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertTrue(srcset['webp'].endswith(f'/media/products/derivatives/{product.image_hash[:2]}/'
+                                                f'{product.image_hash}/300.webp 300w'))
+        with default_storage.open(f'products/derivatives/{product.image_hash[:2]}/{product.image_hash}/100.jpeg') as f:
+            self.assertEqual(PILImage.open(f).size, (100, 50))
+
+    def test_derivatives_are_shared_by_content_hash(self):
+        first = self.create(image_file(120, 120))
+        with mock.patch('products.images._encode') as encode:
+            second = self.create(image_file(120, 120, name='copy.png'))
+        encode.assert_not_called()
+        self.assertEqual(first.image_hash, second.image_hash)
+        self.assertNotEqual(first.image.name, second.image.name)
+
+    @override_settings(PRODUCT_IMAGE_WORKERS=2)
+    def test_upload_is_scheduled_after_commit(self):
+        with mock.patch.object(images.pool, 'schedule') as schedule:
+            product = self.create(image_file(50, 50))
+        schedule.assert_called_once_with(product.pk)
+        self.assertEqual(product.image_hash, '')
+        product.price = Decimal('6.00')
+        with mock.patch.object(images.pool, 'schedule') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        schedule.assert_not_called()
+
+    def test_backfill_command(self):
+        name = default_storage.save('products/old.png', image_file(250, 100))
+        product = Product.objects.create(name='Old', description='', price=Decimal('1.00'), image=name)
+        self.assertEqual(product.image_hash, '')
+        out = io.StringIO()
+        call_command('generate_image_derivatives', stdout=out)
+        self.assertIn('for 1 products, 0 failed', out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(product.image_widths, [100, 200, 250])
@@ -1,7 +1,12 @@
 from django.urls import path
-from .views import ProductListCreateView, ProductDetailView
+from core.asyncviews import select_view
+from .views import (
+    AsyncProductDetailView, AsyncProductListView, ProductListCreateView, ProductDetailView, ProductImportView
+)
 
 urlpatterns = [
-    path('', ProductListCreateView.as_view(), name='product-list'),
-    path('<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
-]
\ No newline at end of file
+    path('', select_view('product-list', ProductListCreateView, AsyncProductListView), name='product-list'),
+    path('import/', ProductImportView.as_view(), name='product-import'),
+    path('<int:pk>/', select_view('product-detail', ProductDetailView, AsyncProductDetailView),
+         name='product-detail'),
+]
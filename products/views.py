@@ -1,13 +1,33 @@
+import codecs
 from rest_framework import generics, permissions
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, UnsupportedMediaType
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core.asyncviews import AsyncDetailView, AsyncListView, JSONResponse
+from core.instrumentation import SerializerTimingMixin, span
+from core.pagination import OptInKeysetPagination
+from core.projections import ProjectionListMixin
+from .cache import (
+    acached_response, adetail_cache_key, alist_cache_key, cached_response, detail_cache_key, list_cache_key
+)
+from .imports import import_products, READERS
 from .models import Product
-from .serializers import ProductSerializer
+from .search import ProductSearchFilter
+from .serializers import ProductProjection, ProductSerializer
 from users.permissions import IsAdmin
 
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(SerializerTimingMixin, ProjectionListMixin, generics.ListCreateAPIView):
     """List all products or create new product (Admin only)"""
-    queryset = Product.objects.all()
+    queryset = Product.objects.order_by('id')
     serializer_class = ProductSerializer
+    projection_class = ProductProjection
+    pagination_class = OptInKeysetPagination
+    # Search results are ranked on page-number pages, by id on keyset pages
+    filter_backends = [ProductSearchFilter]
+    keyset_ordering = 'id'
+    # auth, count, page
+    query_budget = {'GET': 3}
+    read_database = True
     
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -16,13 +36,79 @@ class ProductListCreateView(generics.ListCreateAPIView):
     
     def perform_create(self, serializer):
         serializer.save()
+    
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, list_cache_key(request),
+            lambda: super(ProductListCreateView, self).list(request, *args, **kwargs)
+        )
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(SerializerTimingMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a product (Admin only for update/delete)"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    query_budget = {'GET': 2}
+    read_database = True
     
     def get_permissions(self):
         if self.request.method == 'GET':
             return [permissions.IsAuthenticated()]
-        return [IsAdmin()]
\ No newline at end of file
+        return [IsAdmin()]
+    
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, detail_cache_key(request, kwargs['pk']),
+            lambda: super(ProductDetailView, self).retrieve(request, *args, **kwargs)
+        )
+
+class ProductImportView(APIView):
+    """Create or update products by SKU from a CSV or NDJSON request body (Admin only)"""
+    permission_classes = [IsAdmin]
+    content_types = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+    }
+    batch_size = 1000
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip().lower()
+        if content_type not in self.content_types:
+            raise UnsupportedMediaType(content_type)
+        # The body is read line by line, never loaded whole. Batches commit as
+        # they go, so bad bytes are replaced rather than aborting halfway.
+        lines = codecs.iterdecode(request._request, 'utf-8-sig', errors='replace')
+        rows = READERS[self.content_types[content_type]](lines)
+        return Response(import_products(rows, batch_size=self.batch_size).as_dict())
+
+
+class AsyncProductListView(AsyncListView):
+    """Async GET for ``ProductListCreateView``"""
+    sync_view_class = ProductListCreateView
+    projection_class = ProductProjection
+    query_budget = {'GET': 3}
+    read_database = True
+
+    def get_queryset(self, request):
+        return ProductSearchFilter().filter_queryset(request, Product.objects.order_by('id'), self)
+
+    async def get(self, request, *args, **kwargs):
+        return await acached_response(
+            request, await alist_cache_key(request), lambda: self.alist(request), JSONResponse
+        )
+
+class AsyncProductDetailView(AsyncDetailView):
+    """Async GET for ``ProductDetailView``"""
+    sync_view_class = ProductDetailView
+    projection_class = ProductProjection
+    query_budget = {'GET': 2}
+    read_database = True
+
+    def get_queryset(self, request):
+        return Product.objects.all()
+
+    async def get(self, request, *args, **kwargs):
+        return await acached_response(
+            request, await adetail_cache_key(request, kwargs['pk']),
+            lambda: self.aretrieve(request, kwargs['pk']), JSONResponse
+        )
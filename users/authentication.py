@@ -0,0 +1,140 @@
+"""
+JWT authentication that authorizes from token claims.
+
+Access tokens issued through ``ClaimsRefreshToken`` carry the user's
+``role`` and ``is_active``. Instead of loading the whole ``User`` row on
+every request, ``ClaimsJWTAuthentication`` checks those claims against a
+short-lived in-process cache of each user's current state and hands the view
+a ``User`` instance built from the claims, with every other field deferred.
+Permission checks and ``filter(user=request.user)`` never touch the
+database; the first access to any other field loads the rest of the row.
+
+Changing a user's role or deactivating them drops their cached state in
+this process right away (see ``users.signals``) and in other processes
+within ``AUTH_USER_CACHE_TTL`` seconds. From then on, tokens issued with
+the old claims are rejected and the user has to log in again.
+"""
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+from .tokens import AUTH_CLAIMS
+
+
+class UserStateCache:
+    """Bounded, thread-safe TTL cache of ``(role, is_active)`` per user id"""
+
+    def __init__(self, ttl=None, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def _ttl(self):
+        return self.ttl if self.ttl is not None else getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+    def _cached(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        return None
+
+    def _store(self, user_id, state):
+        ttl = self._ttl()
+        if state is not None and ttl > 0:
+            with self.lock:
+                self.entries[user_id] = (time.monotonic() + ttl, state)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return state
+
+    def get(self, user_id):
+        state = self._cached(user_id)
+        if state is None:
+            state = self._store(user_id, User.objects.filter(pk=user_id).values_list(*AUTH_CLAIMS).first())
+        return state
+
+    async def aget(self, user_id):
+        state = self._cached(user_id)
+        if state is None:
+            state = self._store(user_id, await User.objects.filter(pk=user_id).values_list(*AUTH_CLAIMS).afirst())
+        return state
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_states = UserStateCache()
+
+
+def claims_user(user_id, claims):
+    """A saved ``User`` with only the id and ``claims`` loaded"""
+    values = dict(claims, id=user_id)
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db('default', fields, [values[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` without the per-request user lookup.
+
+    Tokens issued before the claims were introduced fall back to loading
+    the user.
+    """
+
+    def get_user(self, validated_token):
+        if not self.has_claims(validated_token):
+            return super().get_user(validated_token)
+        user_id = self.get_user_id(validated_token)
+        return self.user_from_state(user_id, validated_token, user_states.get(user_id))
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if not self.has_claims(validated_token):
+            return await sync_to_async(super().get_user)(validated_token)
+        user_id = self.get_user_id(validated_token)
+        return self.user_from_state(user_id, validated_token, await user_states.aget(user_id))
+
+    def has_claims(self, validated_token):
+        return all(claim in validated_token for claim in AUTH_CLAIMS)
+
+    def get_user_id(self, validated_token):
+        try:
+            return User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError) as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def user_from_state(self, user_id, validated_token, state):
+        if state is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        claims = dict(zip(AUTH_CLAIMS, state))
+        if not claims['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if any(validated_token[claim] != value for claim, value in claims.items()):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return claims_user(user_id, claims)
@@ -0,0 +1,64 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_backends
+from django.contrib.auth.backends import ModelBackend
+from . import hashing
+from .models import User
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` verifying passwords on the bounded hashing pool.
+
+    Outdated hashes are upgraded on successful logins (see
+    ``hashing.verify_password``); only the save runs on the request thread.
+    ``aauthenticate`` awaits the pool instead, for async login views.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            hashing.make_password(password)
+            return None
+        correct, upgraded = hashing.verify_password(password, user.password)
+        if not correct or not self.user_can_authenticate(user):
+            return None
+        if upgraded is not None:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await User._default_manager.aget(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        correct, upgraded = await hashing.averify_password(password, user.password)
+        if not correct or not self.user_can_authenticate(user):
+            return None
+        if upgraded is not None:
+            user.password = upgraded
+            await user.asave(update_fields=['password'])
+        return user
+
+
+async def aauthenticate(request, **credentials):
+    """``django.contrib.auth.authenticate`` for async views"""
+    for backend in get_backends():
+        if hasattr(backend, 'aauthenticate'):
+            user = await backend.aauthenticate(request, **credentials)
+        else:
+            user = await sync_to_async(backend.authenticate)(request, **credentials)
+        if user is not None:
+            return user
+    return None
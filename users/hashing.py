@@ -0,0 +1,116 @@
+"""
+Password hashing on a bounded thread pool.
+
+PBKDF2 is deliberately slow, and a login burst hashing on every request
+worker at once starves catalog and checkout traffic of CPU. Hashes instead
+run on at most ``PASSWORD_HASHING_WORKERS`` threads (``hashlib`` releases
+the GIL while hashing), with at most ``PASSWORD_HASHING_QUEUE`` jobs
+waiting; beyond that callers get ``HashingBusy`` (503) right away instead
+of queueing behind the storm. Async callers await the pool with ``arun``
+without blocking the event loop.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password operations in progress, try again shortly.'
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+class HashingPool:
+    def __init__(self, workers=None, queue=None):
+        self.workers = workers
+        self.queue = queue
+        self.lock = threading.Lock()
+        self.executor = None
+        self.slots = None
+        self.size = 0
+        self.pending = 0
+
+    def _start(self):
+        with self.lock:
+            if self.executor is None:
+                workers = self.workers or getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+                queue = self.queue if self.queue is not None else getattr(settings, 'PASSWORD_HASHING_QUEUE', 32)
+                self.size = workers
+                self.slots = threading.BoundedSemaphore(workers + queue)
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        return self.executor
+
+    @property
+    def saturated(self):
+        """True while every worker is busy"""
+        return self.executor is not None and self.pending >= self.size
+
+    def submit(self, func, *args):
+        executor = self._start()
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        with self.lock:
+            self.pending += 1
+
+        def call():
+            # Free the slot before the caller sees the result
+            try:
+                return func(*args)
+            finally:
+                self._release()
+
+        try:
+            return executor.submit(call)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self):
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+pool = HashingPool()
+
+
+def make_password(password):
+    return pool.run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    return await pool.arun(hashers.make_password, password)
+
+
+def _verify(password, encoded, rehash):
+    upgraded = []
+    setter = (lambda raw: upgraded.append(hashers.make_password(raw))) if rehash else None
+    return hashers.check_password(password, encoded, setter), (upgraded[0] if upgraded else None)
+
+
+def verify_password(password, encoded):
+    """
+    ``(is_correct, new_encoded)`` for ``password`` against ``encoded``.
+
+    ``new_encoded`` is the password re-hashed with the current hasher
+    settings when ``encoded`` is outdated, computed in the same pool job.
+    Re-hashing is skipped while the pool is saturated, so upgrades happen
+    gradually on quiet logins rather than doubling the cost of a storm.
+    """
+    return pool.run(_verify, password, encoded, not pool.saturated)
+
+
+async def averify_password(password, encoded):
+    """Async ``verify_password``"""
+    return await pool.arun(_verify, password, encoded, not pool.saturated)
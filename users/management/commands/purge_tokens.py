@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from users.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted refresh tokens in bounded batches (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches; the next run picks up the rest')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches to leave room for other writers')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running, purging every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            outstanding, blacklisted = purge_expired_tokens(
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+                pause=options['pause'],
+            )
+            self.stdout.write(f'Purged {outstanding} outstanding and {blacklisted} blacklisted tokens')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index expiry on simplejwt's outstanding tokens, so that
+    ``purge_expired_tokens`` finds expired rows (and the end of them)
+    without scanning the table. The model belongs to another app, hence
+    raw SQL.
+    """
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX token_outstanding_expires_idx ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX token_outstanding_expires_idx',
+        ),
+    ]
@@ -1,20 +1,31 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from . import hashing
 
 class UserManager(BaseUserManager):
     """Custom user manager for email-based authentication"""
     
-    def create_user(self, email, password=None, **extra_fields):
+    def _build_user(self, email, **extra_fields):
         if not email:
             raise ValueError('Users must have an email address')
         
-        email = self.normalize_email(email)
-        user = self.model(email=email, **extra_fields)
+        return self.model(email=self.normalize_email(email), **extra_fields)
+    
+    def create_user(self, email, password=None, **extra_fields):
+        user = self._build_user(email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
     
+    async def acreate_user(self, email, password=None, **extra_fields):
+        """``create_user`` awaiting the hashing pool"""
+        user = self._build_user(email, **extra_fields)
+        user.password = await hashing.amake_password(password)
+        user._password = password
+        await user.asave(using=self._db)
+        return user
+    
     def create_superuser(self, email, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -46,6 +57,19 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
     
+    def set_password(self, raw_password):
+        # Hash on the bounded pool rather than the request worker
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        # Touching one deferred field (e.g. on a user built from token
+        # claims) loads all of them in a single query instead of one each.
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, **kwargs)
+
     @property
     def is_admin(self):
         return self.role == self.Role.ADMIN
\ No newline at end of file
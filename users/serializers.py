@@ -1,6 +1,12 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from .authentication import user_states
 from .models import User
+from .tokens import AUTH_CLAIMS, ClaimsRefreshToken
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -33,4 +39,49 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
 class LogoutSerializer(serializers.Serializer):
-    refresh_token = serializers.CharField()
\ No newline at end of file
+    refresh_token = serializers.CharField()
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    Refresh-token rotation with ``ClaimsRefreshToken`` bookkeeping.
+
+    Checks the user against the cached auth state rather than loading the
+    row, re-issues the claims from that state, and relies on ``blacklist()``
+    rather than a separate lookup to reject reused tokens.
+    """
+    refresh = serializers.CharField()
+    access = serializers.CharField(read_only=True)
+
+    default_error_messages = {
+        'no_active_account': _('No active account found for the given token.')
+    }
+
+    def validate(self, attrs):
+        rotate = api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION
+        refresh = ClaimsRefreshToken(attrs['refresh'], verify=not rotate)
+        if rotate:
+            refresh.verify_for_rotation()
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        claims = {}
+        if user_id:
+            claims = dict(zip(AUTH_CLAIMS, user_states.get(User._meta.pk.to_python(user_id)) or ()))
+        # Tokens without a user claim have no account to check: reject them
+        if not claims.get('is_active'):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        for claim, value in claims.items():
+            refresh[claim] = value
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            with transaction.atomic():
+                if api_settings.BLACKLIST_AFTER_ROTATION:
+                    refresh.blacklist()
+                refresh.set_jti()
+                refresh.set_exp()
+                refresh.set_iat()
+                refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import user_states
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_state(sender, instance, **kwargs):
+    # After commit, so concurrent requests can't re-cache the old state
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_states.invalidate(user_id))
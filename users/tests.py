@@ -1,3 +1,249 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import timedelta
+from io import StringIO
+from threading import Event
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from cart.models import Cart
+from core.loadtest import async_views
+from products.models import Product
+from .authentication import user_states
+from .hashing import HashingBusy, HashingPool, _verify
+from .models import User
+from .throttling import TokenBucketThrottle
+from .tokens import ClaimsRefreshToken, blacklisted_jtis, purge_expired_tokens
 
-# Create your tests here.
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user_states.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345',
+                                             first_name='Ada')
+        product = Product.objects.create(name='A', description='', price=Decimal('1.00'), stock=5)
+        Cart.objects.create(user=self.user, product=product, quantity=2)
+        self.login()
+
+    def login(self):
+        response = self.client.post(reverse('login'), {'email': 'customer@example.com', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_reads_authorize_from_claims(self):
+        self.client.get(reverse('cart-list'))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.data['results'][0]['quantity'], 2)
+        self.client.get(reverse('product-list'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('product-list')).status_code, status.HTTP_200_OK)
+
+    def test_other_fields_load_lazily_in_one_query(self):
+        self.client.get(reverse('cart-list'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['first_name'], 'Ada')
+        self.assertEqual(response.data['email'], 'customer@example.com')
+
+    def test_refreshed_access_tokens_keep_claims(self):
+        tokens = self.login()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.client.get(reverse('cart-list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cart-list'))
+
+    def test_role_change_revokes_tokens(self):
+        self.client.get(reverse('cart-list'))
+        self.user.role = User.Role.ADMIN
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.login()
+        self.assertEqual(self.client.get(reverse('cart-list')).status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_tokens(self):
+        self.client.get(reverse('cart-list'))
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_without_claims_still_work(self):
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(reverse('cart-list')).status_code, status.HTTP_200_OK)
+
+
+class TokenMaintenanceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user_states.clear()
+        blacklisted_jtis.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        response = self.client.post(reverse('login'), {'email': 'customer@example.com', 'password': 'pass12345'})
+        self.refresh = response.data['refresh']
+
+    def rotate(self, refresh):
+        return self.client.post(reverse('token_refresh'), {'refresh': refresh})
+
+    def test_rotation_blacklists_the_old_token(self):
+        response = self.rotate(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertEqual(self.rotate(response.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_reused_token_is_rejected(self):
+        self.rotate(self.refresh)
+        blacklisted_jtis.clear()
+        self.assertEqual(self.rotate(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertNumQueries(0):
+            response = self.rotate(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reissues_current_claims(self):
+        self.user.role = User.Role.ADMIN
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        access = self.rotate(self.refresh).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(reverse('profile')).data['role'], 'admin')
+
+    def test_refresh_rejects_inactive_users(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.rotate(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejects_tokens_without_user(self):
+        self.assertEqual(self.rotate(str(ClaimsRefreshToken())).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=self.user, jti=f'old-{i}', token='', expires_at=past) for i in range(5)
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[:3]])
+        self.assertEqual(purge_expired_tokens(batch_size=2, max_batches=1), (2, 2))
+        out = StringIO()
+        call_command('purge_tokens', batch_size=2, stdout=out)
+        self.assertIn('Purged 3 outstanding and 1 blacklisted tokens', out.getvalue())
+        self.assertFalse(OutstandingToken.objects.filter(expires_at__lt=timezone.now()).exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(self.rotate(self.refresh).status_code, status.HTTP_200_OK)
+
+
+@override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+    'login_ip': '5/min', 'login_email': '2/min',
+}))
+class LoginPipelineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+
+    def login(self, email='customer@example.com', password='pass12345', **extra):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, **extra)
+
+    def test_email_bucket_rejects_before_hashing(self):
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        with mock.patch('users.hashing.verify_password') as verify:
+            response = self.login(email='Customer@example.com ')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        verify.assert_not_called()
+
+    def test_ip_bucket_spans_emails(self):
+        for i in range(5):
+            self.login(email=f'other-{i}@example.com')
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    def test_bucket_refills_over_time(self):
+        self.login()
+        self.login()
+        later = time.time() + 30
+        with mock.patch.object(TokenBucketThrottle, 'timer', return_value=later):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('pass12345', hasher='pbkdf2_sha1'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password('pass12345'))
+
+    def test_full_pool_refuses_work(self):
+        pool = HashingPool(workers=1, queue=0)
+        release = Event()
+        blocker = pool.submit(release.wait)
+        try:
+            with self.assertRaises(HashingBusy):
+                pool.run(make_password, 'pass12345')
+        finally:
+            release.set()
+        blocker.result()
+        self.assertTrue(pool.run(make_password, 'pass12345').startswith('pbkdf2_sha256$'))
+
+
+class AsyncLoginTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='customer@example.com', password='pass12345')
+        Product.objects.create(name='Lamp', description='Desk lamp', price=Decimal('10.00'), stock=5)
+        self.access = ClaimsRefreshToken.for_user(self.user).access_token
+
+    def login(self, password='pass12345'):
+        return self.async_client.post(reverse('login'), {'email': 'customer@example.com', 'password': password},
+                                      content_type='application/json')
+
+    async def test_register_and_login(self):
+        with async_views(['login', 'register']):
+            response = await self.async_client.post(reverse('register'), {
+                'email': 'new@example.com', 'password': 'Long-pass-123', 'password2': 'Long-pass-123',
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.json()['email'], 'new@example.com')
+            self.assertTrue(await User.objects.filter(email='new@example.com', password__startswith='pbkdf2').aexists())
+            self.assertEqual((await self.login(password='wrong')).status_code, status.HTTP_401_UNAUTHORIZED)
+            response = await self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()), {'refresh', 'access', 'user'})
+
+    async def test_catalog_served_while_hashes_pending(self):
+        started, release = Event(), Event()
+
+        def held(*args):
+            started.set()
+            release.wait(10)
+            return _verify(*args)
+
+        with async_views(['login']), mock.patch('users.hashing._verify', held):
+            logins = [asyncio.ensure_future(self.login()) for _ in range(3)]
+            try:
+                self.assertTrue(await asyncio.to_thread(started.wait, 5))
+                # Sync views share one thread under ASGI; a login blocking
+                # on its hash would hold it
+                response = await asyncio.wait_for(self.async_client.get(
+                    reverse('product-list'), headers={'Authorization': f'Bearer {self.access}'}), 5)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertFalse(any(login.done() for login in logins))
+            finally:
+                release.set()
+            responses = await asyncio.gather(*logins)
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 3)
@@ -0,0 +1,148 @@
+"""
+Refresh tokens and their outstanding/blacklist bookkeeping.
+
+Rotation with ``BLACKLIST_AFTER_ROTATION`` records every refresh token ever
+issued. ``ClaimsRefreshToken`` keeps that bookkeeping cheap: issuing and
+blacklisting are single inserts, a unique constraint on the blacklist
+detects replayed tokens, and jtis known to be blacklisted are rejected from
+an in-process LRU (``blacklisted_jtis``) without a query. Negative answers
+still come from the database, since other processes blacklist tokens too.
+``purge_expired_tokens`` removes rows that can no longer verify anyway.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# Claims ``ClaimsJWTAuthentication`` authorizes from without loading the user
+AUTH_CLAIMS = ('role', 'is_active')
+
+
+class BlacklistFront:
+    """Bounded LRU of blacklisted jtis, each kept until its token expires"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def add(self, jti, exp):
+        with self.lock:
+            self.entries[jti] = exp
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __contains__(self, jti):
+        with self.lock:
+            exp = self.entries.get(jti)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                del self.entries[jti]
+                return False
+            self.entries.move_to_end(jti)
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+blacklisted_jtis = BlacklistFront()
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's authorization claims.
+
+    Claims are copied into every access token derived from it, including
+    the ones issued by ``TokenRefreshView``.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in AUTH_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+    @property
+    def jti(self):
+        return self.payload[api_settings.JTI_CLAIM]
+
+    def check_blacklist(self, use_database=True):
+        if self.jti in blacklisted_jtis:
+            raise TokenError(_('Token is blacklisted'))
+        if use_database and BlacklistedToken.objects.filter(token__jti=self.jti).exists():
+            blacklisted_jtis.add(self.jti, self.payload['exp'])
+            raise TokenError(_('Token is blacklisted'))
+
+    def verify_for_rotation(self):
+        """Verify without the blacklist query; ``blacklist()`` detects reuse instead"""
+        self.check_blacklist(use_database=False)
+        Token.verify(self)
+
+    def blacklist(self):
+        """
+        Blacklist this token, raising ``TokenError`` if it already was.
+
+        The unique token on ``BlacklistedToken`` makes this safe against two
+        concurrent rotations of the same refresh token.
+        """
+        token_id = OutstandingToken.objects.filter(jti=self.jti).values_list('pk', flat=True).first()
+        if token_id is None:
+            token_id = self.outstand().pk
+        try:
+            with transaction.atomic():
+                blacklisted = BlacklistedToken.objects.create(token_id=token_id)
+        except IntegrityError:
+            blacklisted_jtis.add(self.jti, self.payload['exp'])
+            raise TokenError(_('Token is blacklisted'))
+        blacklisted_jtis.add(self.jti, self.payload['exp'])
+        return blacklisted
+
+    def outstand(self):
+        """Record a newly issued token in a single insert"""
+        return OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.jti,
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+
+
+def purge_expired_tokens(batch_size=1000, max_batches=None, pause=0.0, now=None):
+    """
+    Delete expired outstanding tokens and their blacklist entries.
+
+    Works in batches of ``batch_size`` rows, each in its own short
+    transaction, so the purge never holds locks for long. Returns the
+    numbers of outstanding and blacklisted tokens deleted.
+    """
+    now = now or timezone.now()
+    outstanding = blacklisted = batches = 0
+    while max_batches is None or batches < max_batches:
+        # Read in expires_at index order (users migration 0002), so the
+        # last, empty batch stops at the first live token too
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lt=now)
+            .order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            outstanding += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return outstanding, blacklisted
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, ProfileView
+from core.asyncviews import select_view
+from .views import AsyncLoginView, AsyncRegisterView, RegisterView, LoginView, LogoutView, ProfileView
 
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
+    path('register/', select_view('register', RegisterView, AsyncRegisterView), name='register'),
+    path('login/', select_view('login', LoginView, AsyncLoginView), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', ProfileView.as_view(), name='profile'),
 ]
\ No newline at end of file
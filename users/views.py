@@ -1,15 +1,20 @@
 from django.shortcuts import render
 
 # Create your views here.
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
+from core.asyncviews import AsyncReadView, JSONResponse
+from .backends import aauthenticate
 from .models import User
+from .tokens import ClaimsRefreshToken
 from .serializers import UserSerializer, LoginSerializer, LogoutSerializer
 from .permissions import IsAdmin, IsCustomer
+from .throttling import LoginEmailThrottle, LoginIPThrottle
 
 class RegisterView(generics.CreateAPIView):
     """User Registration View"""
@@ -20,6 +25,8 @@ class RegisterView(generics.CreateAPIView):
 class LoginView(TokenObtainPairView):
     """User Login View (returns JWT tokens)"""
     permission_classes = [permissions.AllowAny]
+    # Checked before any password hashing happens
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
     
     def post(self, request, *args, **kwargs):
         serializer = LoginSerializer(data=request.data)
@@ -36,7 +43,7 @@ class LoginView(TokenObtainPairView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
         return Response({
             'refresh': str(refresh),
@@ -44,6 +51,44 @@ class LoginView(TokenObtainPairView):
             'user': UserSerializer(user).data
         })
 
+class AsyncRegisterView(AsyncReadView):
+    """``RegisterView`` for ASGI: awaits the hashing pool instead of holding a thread"""
+    sync_view_class = RegisterView
+    async_methods = ('POST',)
+    permission_classes = [permissions.AllowAny]
+
+    async def post(self, request, *args, **kwargs):
+        serializer = UserSerializer(data=request.data)
+        # The unique email check queries the database
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        fields = dict(serializer.validated_data)
+        fields.pop('password2')
+        user = await User.objects.acreate_user(**fields)
+        return JSONResponse(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+
+class AsyncLoginView(AsyncReadView):
+    """``LoginView`` for ASGI: awaits the hashing pool instead of holding a thread"""
+    sync_view_class = LoginView
+    async_methods = ('POST',)
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = LoginView.throttle_classes
+
+    async def post(self, request, *args, **kwargs):
+        serializer = LoginSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = await aauthenticate(request, email=serializer.validated_data['email'],
+                                   password=serializer.validated_data['password'])
+        if user is None:
+            return JSONResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        refresh = await sync_to_async(ClaimsRefreshToken.for_user)(user)
+        return JSONResponse({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': UserSerializer(user).data
+        })
+
 class LogoutView(APIView):
     """User Logout View (blacklists refresh token)"""
     permission_classes = [permissions.IsAuthenticated]
@@ -54,7 +99,7 @@ class LogoutView(APIView):
         
         try:
             refresh_token = serializer.validated_data['refresh_token']
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
             
             return Response(